@@ -78,6 +78,13 @@ WSGI_APPLICATION = "ai_visibility_tracker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite high-concurrency mode: WAL journal, busy timeout and a single batched writer thread
+SQLITE_HIGH_CONCURRENCY = os.getenv('SQLITE_HIGH_CONCURRENCY', 'False') == 'True'
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+DB_WRITER_BATCH_SIZE = int(os.getenv('DB_WRITER_BATCH_SIZE', '200'))
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
@@ -85,6 +92,68 @@ DATABASES = {
     }
 }
 
+if DB_ENGINE == 'postgresql':
+    # Production: PostgreSQL via psycopg 3. Either a per-process connection pool (POSTGRES_POOL=True)
+    # or persistent connections reused for CONN_MAX_AGE seconds; Django does not allow both.
+    POSTGRES_POOL = os.getenv('POSTGRES_POOL', 'False') == 'True'
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv('POSTGRES_DB', 'ai_visibility_tracker'),
+            "USER": os.getenv('POSTGRES_USER', 'postgres'),
+            "PASSWORD": os.getenv('POSTGRES_PASSWORD', ''),
+            "HOST": os.getenv('POSTGRES_HOST', 'localhost'),
+            "PORT": os.getenv('POSTGRES_PORT', '5432'),
+            "CONN_MAX_AGE": 0 if POSTGRES_POOL else int(os.getenv('POSTGRES_CONN_MAX_AGE', '60')),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": int(os.getenv('POSTGRES_POOL_MIN_SIZE', '2')),
+                    "max_size": int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10')),
+                    "timeout": int(os.getenv('POSTGRES_POOL_TIMEOUT', '10')),
+                },
+            } if POSTGRES_POOL else {},
+        }
+    }
+elif SQLITE_HIGH_CONCURRENCY:
+    # Take the write lock when a transaction starts, so waiting honours the busy timeout
+    # instead of failing on a read-to-write lock upgrade
+    DATABASES["default"]["OPTIONS"] = {
+        "transaction_mode": "IMMEDIATE",
+        "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+    }
+
+# Read replica for dashboards, reports, status polling and exports (unset = everything reads the primary).
+# SQLITE_REPLICA_PATH points at a second database file, e.g. one refreshed with `manage.py sync_replica`.
+if DB_ENGINE == 'postgresql' and os.getenv('POSTGRES_REPLICA_HOST'):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv('POSTGRES_REPLICA_HOST'),
+        "TEST": {"MIRROR": "default"},
+    }
+elif DB_ENGINE != 'postgresql' and os.getenv('SQLITE_REPLICA_PATH'):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": BASE_DIR / os.getenv('SQLITE_REPLICA_PATH'),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ['tracker.db_routing.ReplicaRouter']
+# After starting a run a user reads from the primary for this long, so they see their own writes
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '900'))
+
+# Cache (report snapshots). File-based so all worker processes share it.
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv('CACHE_BACKEND', "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv('CACHE_LOCATION', str(BASE_DIR / ".cache")),
+    }
+}
+
+REPORT_SNAPSHOT_TIMEOUT = int(os.getenv('REPORT_SNAPSHOT_TIMEOUT', str(7 * 24 * 3600)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -133,6 +202,51 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY', '')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
+# Cross-project shared response store (opt-in)
+SHARED_RESPONSE_STORE_ENABLED = os.getenv('SHARED_RESPONSE_STORE_ENABLED', 'False') == 'True'
+SHARED_RESPONSE_MAX_AGE_HOURS = int(os.getenv('SHARED_RESPONSE_MAX_AGE_HOURS', '24'))
+
+# Near-duplicate prompt detection (Jaccard similarity of character shingles)
+PROMPT_DEDUP_THRESHOLD = float(os.getenv('PROMPT_DEDUP_THRESHOLD', '0.7'))
+
+# Module 1 competitor discovery / prompt generation cache
+MODULE1_CACHE_TTL_HOURS = int(os.getenv('MODULE1_CACHE_TTL_HOURS', '168'))
+
+# Module 3 section graph
+MODULE3_MAX_WORKERS = int(os.getenv('MODULE3_MAX_WORKERS', '4'))
+MODULE3_STREAM_SECTIONS = os.getenv('MODULE3_STREAM_SECTIONS', 'False') == 'True'
+
+# Upper bound on the data summary sent to generate_insights (estimated tokens)
+INSIGHTS_TOKEN_BUDGET = int(os.getenv('INSIGHTS_TOKEN_BUDGET', '3000'))
+
+# Monitoring scheduler
+# Daily call budget per provider, e.g. "chatgpt:500,claude:300,gemini:1000" (unset = unlimited);
+# covers model queries and the sentiment/report calls sent to the reasoning model (Gemini)
+PROVIDER_DAILY_CALL_BUDGET = {
+    provider.strip(): int(limit)
+    for provider, limit in (
+        item.split(':', 1) for item in os.getenv('PROVIDER_DAILY_CALL_BUDGET', '').split(',') if ':' in item
+    )
+}
+SCHEDULER_MAX_CONCURRENT_RUNS = int(os.getenv('SCHEDULER_MAX_CONCURRENT_RUNS', '2'))
+SCHEDULER_STALE_RUN_HOURS = int(os.getenv('SCHEDULER_STALE_RUN_HOURS', '6'))
+
+# Adaptive refresh: smoothing of ranking volatility and the age after which any answer is re-queried
+REFRESH_VOLATILITY_ALPHA = float(os.getenv('REFRESH_VOLATILITY_ALPHA', '0.3'))
+REFRESH_MAX_AGE_HOURS = int(os.getenv('REFRESH_MAX_AGE_HOURS', '168'))
+
+# Execution log buffering: rows per bulk insert, max seconds an entry waits, and the share of
+# routine info entries (e.g. one per model call) that is kept
+EXECUTION_LOG_BUFFER_SIZE = int(os.getenv('EXECUTION_LOG_BUFFER_SIZE', '100'))
+EXECUTION_LOG_FLUSH_SECONDS = float(os.getenv('EXECUTION_LOG_FLUSH_SECONDS', '5'))
+EXECUTION_LOG_SAMPLE_RATE = float(os.getenv('EXECUTION_LOG_SAMPLE_RATE', '1.0'))
+
+# Retention: execution logs older than this are compacted into per-run summaries, and completed,
+# unscheduled projects idle this long have their raw data moved to ARCHIVE_DIR
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '30'))
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', str(BASE_DIR / "archive"))
+
 # Login URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
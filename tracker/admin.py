@@ -1,8 +1,9 @@
 from django.contrib import admin
 from .models import (
-    VisibilityProject, Brand, Competitor, AIModel, Prompt,
+    VisibilityProject, Brand, Competitor, TrackedBrand, AIModel, Prompt,
     ModelSelection, PromptResponse, BrandMention, SentimentScore,
-    VisibilityScore, DetailedReport, ExecutionLog
+    VisibilityScore, DetailedReport, ExecutionLog, WorkflowCache,
+    Run, RunScore, BrandRollup, MonitoringSchedule, ProviderUsage
 )
 
 
@@ -24,6 +25,13 @@ class CompetitorAdmin(admin.ModelAdmin):
     list_filter = ['is_ai_suggested', 'is_validated']
 
 
+@admin.register(TrackedBrand)
+class TrackedBrandAdmin(admin.ModelAdmin):
+    list_display = ['name', 'project', 'key', 'is_main_brand']
+    list_filter = ['is_main_brand']
+    search_fields = ['name', 'key']
+
+
 @admin.register(AIModel)
 class AIModelAdmin(admin.ModelAdmin):
     list_display = ['display_name', 'name', 'weight', 'is_active']
@@ -45,8 +53,8 @@ class PromptResponseAdmin(admin.ModelAdmin):
 
 @admin.register(BrandMention)
 class BrandMentionAdmin(admin.ModelAdmin):
-    list_display = ['brand_name', 'position', 'is_main_brand', 'response']
-    list_filter = ['is_main_brand']
+    list_display = ['brand', 'position', 'response']
+    list_filter = ['brand__is_main_brand']
 
 
 @admin.register(SentimentScore)
@@ -57,7 +65,7 @@ class SentimentScoreAdmin(admin.ModelAdmin):
 
 @admin.register(VisibilityScore)
 class VisibilityScoreAdmin(admin.ModelAdmin):
-    list_display = ['brand_name', 'project', 'normalized_score', 'total_mentions']
+    list_display = ['brand', 'project', 'normalized_score', 'total_mentions']
     list_filter = ['is_main_brand']
     ordering = ['-normalized_score']
 
@@ -72,3 +80,40 @@ class ExecutionLogAdmin(admin.ModelAdmin):
     list_display = ['project', 'level', 'module', 'message', 'timestamp']
     list_filter = ['level', 'module']
     search_fields = ['message']
+
+
+@admin.register(WorkflowCache)
+class WorkflowCacheAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'area_of_work', 'company_name', 'hit_count', 'updated_at']
+    list_filter = ['kind']
+    search_fields = ['area_of_work', 'company_name']
+
+
+@admin.register(Run)
+class RunAdmin(admin.ModelAdmin):
+    list_display = ['project', 'number', 'status', 'trigger', 'started_at', 'finished_at']
+    list_filter = ['status', 'trigger']
+
+
+@admin.register(RunScore)
+class RunScoreAdmin(admin.ModelAdmin):
+    list_display = ['brand_name', 'run', 'normalized_score', 'total_mentions']
+    list_filter = ['is_main_brand']
+
+
+@admin.register(BrandRollup)
+class BrandRollupAdmin(admin.ModelAdmin):
+    list_display = ['brand_name', 'project', 'period', 'period_start', 'run_count', 'avg_score']
+    list_filter = ['period', 'is_main_brand']
+
+
+@admin.register(MonitoringSchedule)
+class MonitoringScheduleAdmin(admin.ModelAdmin):
+    list_display = ['project', 'cron_expression', 'call_budget', 'is_active', 'next_run_at', 'last_run_at', 'last_skip_reason']
+    list_filter = ['is_active']
+
+
+@admin.register(ProviderUsage)
+class ProviderUsageAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'day', 'calls']
+    list_filter = ['provider']
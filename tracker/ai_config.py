@@ -8,8 +8,14 @@ from django.conf import settings
 import time
 import logging
 
+from .db_writer import write
+from .provider_budget import try_consume_call
+
 logger = logging.getLogger(__name__)
 
+# Provider behind get_chatgpt(); reasoning calls count against its daily budget
+REASONING_PROVIDER = 'gemini'
+
 
 class AIModelConfig:
     """Configuration for AI models with retry logic"""
@@ -108,6 +114,9 @@ def get_chatgpt():
 
 
 def invoke_chatgpt(prompt):
-    """Invoke primary reasoning model with retry logic (currently Gemini)"""
+    """Invoke primary reasoning model with retry logic (currently Gemini), charged to its provider's budget"""
+    if not write(try_consume_call, REASONING_PROVIDER):
+        return False, "", f"Daily call budget for {REASONING_PROVIDER} exhausted"
+    
     model = get_chatgpt()
     return AIModelConfig.invoke_with_retry(model, prompt)
@@ -0,0 +1,56 @@
+"""
+Canonical brands
+Normalizes brand names to one TrackedBrand row per project so mentions and scores join on an integer key
+"""
+from typing import Dict, List, Tuple
+
+from .models import VisibilityProject, TrackedBrand
+
+
+def brand_key(name: str) -> str:
+    """Case-folded name with whitespace collapsed"""
+    return ' '.join((name or '').casefold().split())
+
+
+def sync_project_brands(project: VisibilityProject) -> Dict[str, TrackedBrand]:
+    """
+    Make sure the main brand and every competitor has a TrackedBrand
+
+    Returns: brand key -> TrackedBrand for the main brand and current competitors
+    """
+    existing = {brand.key: brand for brand in TrackedBrand.objects.filter(project=project)}
+    brands = {}
+
+    wanted = [(project.company_name, True, None)] + [
+        (competitor.name, False, competitor) for competitor in project.competitors.all()
+    ]
+
+    for name, is_main, competitor in wanted:
+        key = brand_key(name)
+        brand = existing.get(key)
+
+        if brand is None:
+            brand = TrackedBrand.objects.create(
+                project=project,
+                name=name,
+                key=key,
+                is_main_brand=is_main,
+                competitor=competitor
+            )
+        elif brand.is_main_brand != is_main or brand.competitor_id != (competitor.id if competitor else None):
+            brand.is_main_brand = is_main
+            brand.competitor = competitor
+            brand.save(update_fields=['is_main_brand', 'competitor'])
+
+        brands[key] = brand
+
+    return brands
+
+
+def search_terms(brands: Dict[str, TrackedBrand]) -> List[Tuple[str, TrackedBrand]]:
+    """(surface form, brand) pairs to look for in answers: each name plus its aliases"""
+    terms = []
+    for brand in brands.values():
+        terms.append((brand.name, brand))
+        terms.extend((alias, brand) for alias in brand.aliases if brand_key(alias) != brand.key)
+    return terms
@@ -0,0 +1,138 @@
+"""
+Token-budgeted context for the module 3 insights prompt
+Compacts leaderboard, prompt, model and negative sentiment data to fit a budget
+"""
+import json
+import math
+import re
+from typing import Dict, List, Tuple
+from django.conf import settings
+
+CHARS_PER_TOKEN = 4  # Conservative estimate for English text and compact JSON
+MAX_CONTEXT_CHARS = 200
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text sent to the model"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(data) -> str:
+    """JSON without indentation or spaces after separators"""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+class InsightsContextBuilder:
+    """Builds the data summary for generate_insights within a token budget"""
+    
+    # Tried in order until the summary fits
+    TOP_K_STEPS = (10, 5, 3, 1)
+    
+    def __init__(self, brand_name: str, token_budget: int = None):
+        self.brand_name = brand_name
+        self.token_budget = token_budget or settings.INSIGHTS_TOKEN_BUDGET
+    
+    def build(
+        self,
+        competitor_comparison: Dict,
+        prompt_wise: Dict,
+        model_wise: Dict,
+        negative_sentiment: Dict
+    ) -> Tuple[str, int]:
+        """
+        Returns: (data summary, estimated token count)
+        """
+        summary = ''
+        for top_k in self.TOP_K_STEPS:
+            summary = self._render(competitor_comparison, prompt_wise, model_wise, negative_sentiment, top_k)
+            tokens = estimate_tokens(summary)
+            if tokens <= self.token_budget:
+                return summary, tokens
+        
+        # Still over budget at the smallest k: cut the lowest-priority tail
+        summary = summary[:self.token_budget * CHARS_PER_TOKEN]
+        return summary, estimate_tokens(summary)
+    
+    def _render(self, competitor_comparison, prompt_wise, model_wise, negative_sentiment, top_k) -> str:
+        leaderboard = competitor_comparison.get('leaderboard', [])
+        prompts = prompt_wise.get('prompts', [])
+        
+        sections = [
+            ('Main Brand', self.brand_name),
+            (f'LEADERBOARD (top {top_k} of {len(leaderboard)} + main brand)',
+             compact_json(self._top_leaderboard(leaderboard, top_k))),
+            ('GAP ANALYSIS', compact_json(competitor_comparison.get('gap_analysis', {}))),
+            ('PROMPT WINS BY BRAND', compact_json(self._wins_by_brand(prompts))),
+            (f'PROMPTS WHERE {self.brand_name} IS MISSING',
+             compact_json(self._missing_prompts(prompts, top_k))),
+            (f'PROMPT-WISE WINNERS (first {top_k} of {len(prompts)})',
+             compact_json(self._prompt_winners(prompts, top_k))),
+            ('MODEL-WISE PERFORMANCE', compact_json(model_wise.get('models', []))),
+            (f"NEGATIVE SENTIMENT ({negative_sentiment.get('total_negative', 0)} mentions)",
+             compact_json(self._negative_by_brand(negative_sentiment.get('instances', []), top_k))),
+        ]
+        
+        return '\n'.join(f"{title}:\n{body}" for title, body in sections)
+    
+    def _top_leaderboard(self, leaderboard: List[Dict], top_k: int) -> List[Dict]:
+        rows = leaderboard[:top_k]
+        main = next(
+            (entry for entry in leaderboard if entry['brand'].lower() == self.brand_name.lower()),
+            None
+        )
+        if main is not None and main not in rows:
+            rows = rows + [main]
+        return rows
+    
+    @staticmethod
+    def _wins_by_brand(prompts: List[Dict]) -> Dict[str, int]:
+        wins = {}
+        for item in prompts:
+            if item.get('winner'):
+                wins[item['winner']] = wins.get(item['winner'], 0) + 1
+        return dict(sorted(wins.items(), key=lambda pair: -pair[1]))
+    
+    @staticmethod
+    def _missing_prompts(prompts: List[Dict], top_k: int) -> Dict:
+        missing = [item['prompt'] for item in prompts if not item.get('main_brand_present')]
+        return {'count': len(missing), 'examples': missing[:top_k]}
+    
+    @staticmethod
+    def _prompt_winners(prompts: List[Dict], top_k: int) -> List[Dict]:
+        return [
+            {
+                'prompt': item['prompt'],
+                'winner': item['winner'],
+                'main_brand_position': item.get('main_brand_position')
+            }
+            for item in prompts[:top_k]
+        ]
+    
+    @staticmethod
+    def _negative_by_brand(instances: List[Dict], top_k: int) -> Dict[str, Dict]:
+        """Per-brand counts with deduplicated, truncated contexts"""
+        by_brand = {}
+        for instance in instances:
+            entry = by_brand.setdefault(instance['brand'], {'count': 0, 'contexts': {}})
+            entry['count'] += 1
+            
+            context = _WHITESPACE.sub(' ', instance.get('context') or '').strip()[:MAX_CONTEXT_CHARS]
+            key = context.lower()
+            if key in entry['contexts']:
+                entry['contexts'][key]['n'] += 1
+            else:
+                entry['contexts'][key] = {
+                    'text': context,
+                    'reason': (instance.get('reasoning') or '')[:MAX_CONTEXT_CHARS],
+                    'n': 1
+                }
+        
+        return {
+            brand: {
+                'count': entry['count'],
+                'contexts': sorted(entry['contexts'].values(), key=lambda c: -c['n'])[:top_k]
+            }
+            for brand, entry in sorted(by_brand.items(), key=lambda pair: -pair[1]['count'])
+        }
@@ -0,0 +1,83 @@
+"""
+Read-replica routing
+Read-only views read tracker data from the 'replica' alias; a user who just started a run is kept on the
+primary for REPLICA_STICKY_SECONDS so they see their own writes
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+STICKY_SESSION_KEY = 'db_primary_until'
+
+# Alias reads are routed to while a read-only view runs; None = primary
+_read_alias: ContextVar[Optional[str]] = ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+    """Sends tracker reads to the alias chosen by `read_replica`; every write goes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        # Sessions and auth stay on the primary: a lagging replica must not log users out
+        if model._meta.app_label != 'tracker':
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def reading_replica() -> bool:
+    """True while a read-only view is served from the replica"""
+    return _read_alias.get() is not None
+
+
+def stick_to_primary(request):
+    """Read this user's requests from the primary for a while, e.g. after they trigger a run"""
+    request.session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+
+def is_sticky(request) -> bool:
+    return request.session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def _pinned(chunks, alias: str):
+    """Keep the alias while a streaming response is consumed after the view returned"""
+    token = _read_alias.set(alias)
+    try:
+        yield from chunks
+    finally:
+        _read_alias.reset(token)
+
+
+def read_replica(view):
+    """Serve a read-only view from the replica unless the user is sticky to the primary"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or is_sticky(request):
+            return view(request, *args, **kwargs)
+
+        token = _read_alias.set(REPLICA_ALIAS)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+        if response.streaming:
+            response.streaming_content = _pinned(response.streaming_content, REPLICA_ALIAS)
+        return response
+
+    return wrapper
@@ -0,0 +1,125 @@
+"""
+Single database writer
+In SQLite high-concurrency mode every engine write is handed to one background thread that applies
+whatever is queued in a single transaction, so concurrent runs never contend for the write lock
+"""
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """Background thread applying queued write operations in batched transactions (group commit)"""
+
+    def __init__(self, batch_size: int = 200):
+        self.batch_size = max(batch_size, 1)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wait until everything queued so far has been committed"""
+        self.submit(lambda: None).result(timeout)
+
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Everything that queued up while the previous batch was committing goes into this one
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._apply(batch)
+
+    def _apply(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, fn, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        # Savepoint per operation so one failure does not roll back the batch
+                        with transaction.atomic():
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            logger.exception("Database writer batch failed to commit")
+            for future, _, _, _ in batch:
+                if future.running():
+                    future.set_exception(e)
+            connection.close()
+            return
+
+        # Results are only released once committed, so callers can read their own writes
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'SQLITE_HIGH_CONCURRENCY', False) and connection.vendor == 'sqlite'
+
+
+def get_writer() -> DatabaseWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DatabaseWriter(getattr(settings, 'DB_WRITER_BATCH_SIZE', 200))
+            atexit.register(_writer.flush, 30)
+        return _writer
+
+
+def _runs_inline() -> bool:
+    # Inside a transaction the caller already holds its own write lock; queueing would deadlock on it
+    return not is_enabled() or connection.in_atomic_block or get_writer().on_writer_thread()
+
+
+def write(fn: Callable, *args, **kwargs):
+    """Apply a write on the writer thread and return its result once committed"""
+    if _runs_inline():
+        return fn(*args, **kwargs)
+    return get_writer().submit(fn, *args, **kwargs).result()
+
+
+def flush(timeout: Optional[float] = None):
+    if is_enabled() and _writer is not None:
+        _writer.flush(timeout)
+
+
+def bulk_upsert(model, objs: List, unique_fields: List[str], update_fields: List[str], batch_size: int = 500) -> List:
+    """INSERT ... ON CONFLICT (unique_fields) DO UPDATE for unsaved instances; native on PostgreSQL and SQLite"""
+    if not objs:
+        return []
+    return write(
+        model.objects.bulk_create,
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields
+    )
@@ -0,0 +1,114 @@
+"""
+Buffered execution log
+Collects ExecutionLog rows in memory and writes them with one bulk insert per flush instead of one INSERT per event
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from django.conf import settings
+from django.db import connection
+
+from .db_writer import write
+from .models import ExecutionLog
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionLogBuffer:
+    """
+    Flushes once `max_entries` rows are waiting, right after any warning or error, whenever the engine
+    calls flush() at a stage boundary, and from a timer once the oldest row has waited `max_age` seconds,
+    so progress shows up even while the engine is blocked on a slow LLM call
+
+    Info entries added with sample=True are kept with probability `sample_rate`; close() records
+    how many were dropped.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_age: Optional[float] = None, sample_rate: Optional[float] = None):
+        self.max_entries = max_entries or settings.EXECUTION_LOG_BUFFER_SIZE
+        self.max_age = max_age if max_age is not None else settings.EXECUTION_LOG_FLUSH_SECONDS
+        self.sample_rate = sample_rate if sample_rate is not None else settings.EXECUTION_LOG_SAMPLE_RATE
+        self._entries = []
+        self._oldest = None
+        self._sampled_out = Counter()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, sample: bool = False, **fields):
+        """Queue one ExecutionLog row; takes the model's fields"""
+        level = fields.get('level', 'info')
+        if sample and level == 'info' and random.random() >= self.sample_rate:
+            project = fields.get('project')
+            with self._lock:
+                self._sampled_out[(project.id if project else fields.get('project_id'), fields.get('module', ''))] += 1
+            return
+
+        # The timestamp is taken now, not when the row is written
+        entry = ExecutionLog(**fields)
+        with self._lock:
+            self._entries.append(entry)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._start_timer()
+            due = (
+                level != 'info'
+                or len(self._entries) >= self.max_entries
+                or time.monotonic() - self._oldest >= self.max_age
+            )
+
+        if due:
+            self.flush()
+
+    def _start_timer(self):
+        if self.max_age <= 0:
+            return
+        self._timer = threading.Timer(self.max_age, self._flush_on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread's own connection
+            connection.close()
+
+    def flush(self):
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._oldest = None
+            timer, self._timer = self._timer, None
+
+        if timer is not None:
+            timer.cancel()
+        if not entries:
+            return
+        try:
+            write(ExecutionLog.objects.bulk_create, entries, batch_size=500)
+        except Exception:
+            # Losing log rows must never fail a run
+            logger.exception(f"Failed to write {len(entries)} execution log entries")
+
+    def close(self):
+        """Record a summary of sampled-out entries and write everything still buffered"""
+        with self._lock:
+            sampled_out, self._sampled_out = self._sampled_out, Counter()
+
+        for (project_id, module), count in sampled_out.items():
+            self.add(
+                project_id=project_id,
+                module=module,
+                level='info',
+                message=f'{count} routine log entries sampled out',
+                details={'sample_rate': self.sample_rate, 'dropped': count}
+            )
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,200 @@
+"""
+Raw data export
+Streams mention, sentiment and response facts as CSV, NDJSON, Parquet or Arrow with constant memory
+"""
+import csv
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+from .models import BrandMention, PromptResponse, ResponseBlob
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Ordered (column, lookup, type) triples; the type drives the Arrow schema
+MENTION_COLUMNS = [
+    ('mention_id', 'id', 'int'),
+    ('response_id', 'response_id', 'int'),
+    ('prompt_id', 'response__prompt_id', 'int'),
+    ('prompt', 'response__prompt__text', 'str'),
+    ('model', 'response__model__name', 'str'),
+    ('brand_id', 'brand_id', 'int'),
+    ('brand', 'brand__name', 'str'),
+    ('is_main_brand', 'brand__is_main_brand', 'bool'),
+    ('position', 'position', 'int'),
+    ('context', 'context', 'str'),
+    ('sentiment', 'sentiment__sentiment', 'str'),
+    ('sentiment_confidence', 'sentiment__confidence', 'float'),
+    ('sentiment_reasoning', 'sentiment__reasoning', 'str'),
+    ('completed_at', 'response__completed_at', 'datetime'),
+]
+
+RESPONSE_COLUMNS = [
+    ('response_id', 'id', 'int'),
+    ('prompt_id', 'prompt_id', 'int'),
+    ('prompt', 'prompt__text', 'str'),
+    ('model', 'model__name', 'str'),
+    ('status', 'status', 'str'),
+    ('temperature', 'temperature', 'float'),
+    ('retry_count', 'retry_count', 'int'),
+    ('raw_response', 'blob__data', 'str'),
+    ('error_message', 'error_message', 'str'),
+    ('source_response_id', 'source_response_id', 'int'),
+    ('created_at', 'created_at', 'datetime'),
+    ('completed_at', 'completed_at', 'datetime'),
+]
+
+# Dataset name -> (queryset factory, columns)
+EXPORT_DATASETS = {
+    'mentions': (lambda project_id: BrandMention.objects.filter(response__project_id=project_id), MENTION_COLUMNS),
+    'responses': (lambda project_id: PromptResponse.objects.filter(project_id=project_id), RESPONSE_COLUMNS),
+}
+
+# Format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+BINARY_FORMATS = {'parquet', 'arrow'}
+
+
+class ExportUnavailable(Exception):
+    """Requested format needs an optional dependency that is not installed"""
+    pass
+
+
+def export_columns(dataset: str) -> List[str]:
+    return [column for column, _, _ in EXPORT_DATASETS[dataset][1]]
+
+
+def iter_rows(project_id: int, dataset: str) -> Iterator[Dict]:
+    """Rows of a dataset read through a server-side cursor in fixed-size chunks"""
+    queryset_for, columns = EXPORT_DATASETS[dataset]
+    lookups = [lookup for _, lookup, _ in columns]
+    names = [column for column, _, _ in columns]
+
+    # Compressed blob columns are inflated one row at a time
+    blob_columns = [index for index, lookup in enumerate(lookups) if lookup.endswith('blob__data')]
+
+    rows = queryset_for(project_id).order_by('id').values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        if blob_columns:
+            row = list(row)
+            for index in blob_columns:
+                row[index] = ResponseBlob.decompress(row[index])
+        yield dict(zip(names, row))
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object whose write returns the value, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_text(row[column]) for column in columns])
+
+
+def iter_ndjson(rows: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({column: _text(row[column]) for column in columns}, ensure_ascii=False) + '\n'
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _ChunkSink:
+    """Write-only file that hands written bytes back to the caller between batches"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable('Parquet and Arrow export require the pyarrow package')
+    return pyarrow
+
+
+def arrow_schema(dataset: str):
+    pa = _import_pyarrow()
+    types = {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'bool': pa.bool_(),
+        'str': pa.string(),
+        'datetime': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(column, types[kind]) for column, _, kind in EXPORT_DATASETS[dataset][1]])
+
+
+def iter_arrow(rows: Iterable[Dict], schema, fmt: str = 'parquet') -> Iterator[bytes]:
+    """Parquet (one row group per chunk) or Arrow IPC stream, flushed after every chunk"""
+    pa = _import_pyarrow()
+
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode='w')
+    writer = pa.parquet.ParquetWriter(out, schema) if fmt == 'parquet' else pa.ipc.new_stream(out, schema)
+    try:
+        for chunk in _chunks(rows, EXPORT_CHUNK_SIZE):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+def stream_export(project_id: int, dataset: str, fmt: str) -> Iterator:
+    """Chunks of the encoded export; str for text formats, bytes for binary ones"""
+    if fmt in BINARY_FORMATS:
+        _import_pyarrow()
+
+    columns = export_columns(dataset)
+    rows = iter_rows(project_id, dataset)
+
+    if fmt == 'csv':
+        return iter_csv(rows, columns)
+    if fmt == 'ndjson':
+        return iter_ndjson(rows, columns)
+    return iter_arrow(rows, arrow_schema(dataset), fmt)
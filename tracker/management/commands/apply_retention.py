@@ -0,0 +1,53 @@
+"""
+Django management command to apply log retention and archive idle projects
+"""
+from django.core.management.base import BaseCommand, CommandError
+from tracker.models import VisibilityProject
+from tracker.retention import ArchiveError, archivable_projects, archive_project, compact_logs, restore_project
+
+
+class Command(BaseCommand):
+    help = 'Compact old execution logs into run summaries and archive the raw data of idle completed projects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log-days', type=int, help='Compact logs older than this (default LOG_RETENTION_DAYS)')
+        parser.add_argument('--archive-days', type=int, help='Archive projects idle this long (default ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without changing it')
+        parser.add_argument('--archive', type=int, metavar='PROJECT_ID', help='Archive one project now, regardless of age')
+        parser.add_argument('--restore', type=int, metavar='PROJECT_ID', help='Restore one archived project and exit')
+
+    def handle(self, *args, **options):
+        if options['restore'] or options['archive']:
+            project_id = options['restore'] or options['archive']
+            try:
+                project = VisibilityProject.objects.get(id=project_id)
+            except VisibilityProject.DoesNotExist:
+                raise CommandError(f'Project {project_id} does not exist')
+
+            try:
+                if options['restore']:
+                    counts = restore_project(project)
+                    self.stdout.write(self.style.SUCCESS(f'Restored {project.company_name}: {counts}'))
+                else:
+                    counts = archive_project(project)
+                    self.stdout.write(self.style.SUCCESS(f'Archived {project.company_name}: {counts}'))
+            except ArchiveError as e:
+                raise CommandError(str(e))
+            return
+
+        stats = compact_logs(options['log_days'], dry_run=options['dry_run'])
+        verb = 'Would compact' if options['dry_run'] else 'Compacted'
+        self.stdout.write(
+            f"{verb} {stats['compacted']} log entries into {stats['runs']} run summaries, "
+            f"dropped {stats['dropped']} pre-run info entries"
+        )
+
+        projects = list(archivable_projects(options['archive_days']))
+        for project in projects:
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {project.company_name} (project {project.id})')
+                continue
+            counts = archive_project(project)
+            self.stdout.write(f'Archived {project.company_name} (project {project.id}): {counts}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(projects)} project(s) {"eligible for archival" if options["dry_run"] else "archived"}'))
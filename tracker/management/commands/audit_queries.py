@@ -0,0 +1,44 @@
+"""
+Django management command to check the query plans of the engines' hot queries
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tracker.query_audit import HOT_QUERIES, seed_dataset, audit_queries
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN hot engine queries against a synthetic dataset (rolled back) and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=40, help='Synthetic projects to create')
+        parser.add_argument('--prompts', type=int, default=25, help='Prompts per synthetic project')
+        parser.add_argument('--query', action='append', choices=sorted(HOT_QUERIES), help='Only audit these queries')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+        parser.add_argument('--strict', action='store_true', help='Exit with an error if any full scan is found')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sample = seed_dataset(projects=options['projects'], prompts=options['prompts'])
+            results = audit_queries(sample, options['query'])
+            # Nothing seeded here may survive the audit
+            transaction.set_rollback(True)
+        
+        flagged = 0
+        for result in results:
+            if result.full_scans:
+                flagged += 1
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {result.name}: full scan of {", ".join(sorted(set(result.full_scans)))}'
+                ))
+            else:
+                note = '  (sorts outside an index)' if result.sorts else ''
+                self.stdout.write(self.style.SUCCESS(f'✓ {result.name}') + note)
+            
+            if result.full_scans or options['verbose_plans']:
+                for line in result.plan.splitlines():
+                    self.stdout.write(f'    {line}')
+        
+        summary = f'\n{len(results) - flagged}/{len(results)} queries use indexes'
+        if flagged and options['strict']:
+            raise CommandError(summary.strip())
+        self.stdout.write(self.style.WARNING(summary) if flagged else self.style.SUCCESS(summary))
@@ -0,0 +1,46 @@
+"""
+Django management command to export raw project facts
+"""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from tracker.models import VisibilityProject
+from tracker.exporters import BINARY_FORMATS, EXPORT_DATASETS, EXPORT_FORMATS, ExportUnavailable, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream mentions/sentiment or responses of a project as CSV, NDJSON, Parquet or Arrow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('--dataset', choices=sorted(EXPORT_DATASETS), default='mentions')
+        parser.add_argument('--format', dest='fmt', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='File to write (defaults to stdout)')
+
+    def handle(self, *args, **options):
+        project_id = options['project_id']
+        dataset = options['dataset']
+        fmt = options['fmt']
+        
+        if not VisibilityProject.objects.filter(id=project_id).exists():
+            raise CommandError(f'Project {project_id} does not exist')
+        
+        try:
+            chunks = stream_export(project_id, dataset, fmt)
+        except ExportUnavailable as e:
+            raise CommandError(str(e))
+        
+        binary = fmt in BINARY_FORMATS
+        if options['output']:
+            out = open(options['output'], 'wb' if binary else 'w', encoding=None if binary else 'utf-8', newline=None if binary else '')
+        else:
+            out = sys.stdout.buffer if binary else sys.stdout
+        
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+        
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f'✅ Exported {dataset} to {options["output"]}'))
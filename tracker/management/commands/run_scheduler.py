@@ -0,0 +1,42 @@
+"""
+Django management command to run scheduled visibility checks
+"""
+import time
+from django.core.management.base import BaseCommand
+from tracker.models import MonitoringSchedule
+from tracker.scheduler import CronSchedule, CronError, tick
+
+
+class Command(BaseCommand):
+    help = 'Start due monitoring schedules; loops until interrupted unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single tick and wait for started runs')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between ticks (default 60)')
+
+    def handle(self, *args, **options):
+        for schedule in MonitoringSchedule.objects.filter(is_active=True).select_related('project'):
+            try:
+                CronSchedule(schedule.cron_expression)
+            except CronError as e:
+                self.stdout.write(self.style.ERROR(f'Deactivating schedule for {schedule.project.company_name}: {e}'))
+                schedule.is_active = False
+                schedule.save(update_fields=['is_active'])
+        
+        if options['once']:
+            threads = tick()
+            self.stdout.write(f'Started {len(threads)} scheduled run(s)')
+            for thread in threads:
+                thread.join()
+            self.stdout.write(self.style.SUCCESS('✅ Scheduled runs finished'))
+            return
+        
+        self.stdout.write(f'Scheduler running every {options["interval"]}s (Ctrl+C to stop)')
+        try:
+            while True:
+                threads = tick()
+                if threads:
+                    self.stdout.write(f'Started {len(threads)} scheduled run(s)')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Scheduler stopped'))
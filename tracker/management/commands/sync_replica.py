@@ -0,0 +1,25 @@
+"""
+Django management command to refresh a local SQLite replica from the primary
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from tracker.db_routing import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the replica file (SQLITE_REPLICA_PATH)'
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('No replica database configured; set SQLITE_REPLICA_PATH')
+        
+        primary, replica = connections['default'], connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas can be synced here; PostgreSQL replicates on its own')
+        
+        primary.ensure_connection()
+        replica.ensure_connection()
+        # Online backup: consistent snapshot without blocking writers for the whole copy
+        primary.connection.backup(replica.connection)
+        
+        self.stdout.write(self.style.SUCCESS(f"Replica {replica.settings_dict['NAME']} synced"))
@@ -0,0 +1,41 @@
+"""
+Django management command to run the test suite against every supported database backend
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# DB_ENGINE value -> driver module it needs
+BACKENDS = {
+    'sqlite': 'sqlite3',
+    'postgresql': 'psycopg',
+}
+
+
+class Command(BaseCommand):
+    help = 'Run the tests once per DB_ENGINE; PostgreSQL is skipped when psycopg is not installed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('labels', nargs='*', default=['tracker'], help='Test labels (default: tracker)')
+
+    def handle(self, *args, **options):
+        failed = []
+        for engine, driver in BACKENDS.items():
+            if importlib.util.find_spec(driver) is None:
+                self.stdout.write(self.style.WARNING(f'Skipping {engine}: {driver} is not installed'))
+                continue
+
+            self.stdout.write(f'Running tests on {engine}')
+            result = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'test', *options['labels']],
+                env={**os.environ, 'DB_ENGINE': engine}
+            )
+            if result.returncode:
+                failed.append(engine)
+
+        if failed:
+            raise CommandError(f'Tests failed on {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('✅ Tests passed on every available backend'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptresponse',
+            name='source_response',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shared_copies', to='tracker.promptresponse'),
+        ),
+        migrations.AddField(
+            model_name='visibilityproject',
+            name='source_project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='impersonations', to='tracker.visibilityproject'),
+        ),
+    ]
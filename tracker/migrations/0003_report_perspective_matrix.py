@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0002_impersonation_shared_responses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detailedreport',
+            name='perspective_matrix',
+            field=models.JSONField(default=dict),
+        ),
+    ]
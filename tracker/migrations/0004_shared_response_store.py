@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_report_perspective_matrix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptresponse',
+            name='prompt_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='promptresponse',
+            name='temperature',
+            field=models.FloatField(default=0.7),
+        ),
+    ]
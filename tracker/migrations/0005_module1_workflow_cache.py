@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_shared_response_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('competitors', 'Competitor Discovery'), ('prompts', 'Prompt Generation')], max_length=20)),
+                ('cache_key', models.CharField(max_length=64)),
+                ('area_of_work', models.CharField(max_length=255)),
+                ('company_name', models.CharField(max_length=255)),
+                ('payload', models.JSONField(default=list)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'cache_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_module1_workflow_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detailedreport',
+            name='section_fingerprints',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_report_section_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detailedreport',
+            name='source_domains',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_report_source_domains'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detailedreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
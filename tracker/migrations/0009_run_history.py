@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_report_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptresponse',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='Run',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('trigger', models.CharField(choices=[('manual', 'Manual'), ('scheduled', 'Scheduled')], default='manual', max_length=20)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='tracker.visibilityproject')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'unique_together': {('project', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='promptresponse',
+            name='run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='responses', to='tracker.run'),
+        ),
+        migrations.CreateModel(
+            name='BrandRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand_name', models.CharField(max_length=255)),
+                ('is_main_brand', models.BooleanField(default=False)),
+                ('period', models.CharField(choices=[('day', 'Daily'), ('week', 'Weekly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('run_count', models.IntegerField(default=0)),
+                ('avg_score', models.FloatField(default=0.0)),
+                ('min_score', models.FloatField(default=0.0)),
+                ('max_score', models.FloatField(default=0.0)),
+                ('avg_frequency', models.FloatField(default=0.0)),
+                ('avg_prominence', models.FloatField(default=0.0)),
+                ('avg_sentiment', models.FloatField(default=0.0)),
+                ('total_mentions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='tracker.visibilityproject')),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'unique_together': {('project', 'brand_name', 'period', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RunResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('raw_response', models.TextField(blank=True)),
+                ('changed', models.BooleanField(default=True)),
+                ('mention_ranking', models.JSONField(default=list)),
+                ('response', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='tracker.promptresponse')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_responses', to='tracker.run')),
+            ],
+            options={
+                'unique_together': {('run', 'response')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RunScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand_name', models.CharField(max_length=255)),
+                ('is_main_brand', models.BooleanField(default=False)),
+                ('frequency_score', models.FloatField(default=0.0)),
+                ('prominence_score', models.FloatField(default=0.0)),
+                ('sentiment_score', models.FloatField(default=0.0)),
+                ('model_coverage_score', models.FloatField(default=0.0)),
+                ('normalized_score', models.FloatField(default=0.0)),
+                ('total_mentions', models.IntegerField(default=0)),
+                ('prompts_appeared_in', models.IntegerField(default=0)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='tracker.run')),
+            ],
+            options={
+                'ordering': ['-normalized_score'],
+                'unique_together': {('run', 'brand_name')},
+            },
+        ),
+    ]
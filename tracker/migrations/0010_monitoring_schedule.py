@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_run_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cron_expression', models.CharField(default='0 6 * * *', max_length=100)),
+                ('stagger_minutes', models.IntegerField(default=30)),
+                ('is_active', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_skip_reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tracker.run')),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='tracker.visibilityproject')),
+            ],
+            options={
+                'ordering': ['next_run_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProviderUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('calls', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('provider', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_monitoring_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitoringschedule',
+            name='call_budget',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='promptresponse',
+            name='volatility',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
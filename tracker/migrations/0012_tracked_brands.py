@@ -0,0 +1,144 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def brand_key(name):
+    return ' '.join((name or '').casefold().split())
+
+
+def create_tracked_brands(apps, schema_editor):
+    """One TrackedBrand per project and normalized name; other spellings become aliases"""
+    VisibilityProject = apps.get_model('tracker', 'VisibilityProject')
+    TrackedBrand = apps.get_model('tracker', 'TrackedBrand')
+    BrandMention = apps.get_model('tracker', 'BrandMention')
+    VisibilityScore = apps.get_model('tracker', 'VisibilityScore')
+
+    for project in VisibilityProject.objects.all().iterator():
+        competitors = {brand_key(c.name): c for c in project.competitors.all()}
+        main_key = brand_key(project.company_name)
+
+        spellings = {}
+        names = (
+            [project.company_name]
+            + [c.name for c in competitors.values()]
+            + list(BrandMention.objects.filter(response__project=project).values_list('brand_name', flat=True).distinct())
+            + list(VisibilityScore.objects.filter(project=project).values_list('brand_name', flat=True).distinct())
+        )
+        for name in names:
+            spellings.setdefault(brand_key(name), []).append(name)
+
+        for key, variants in spellings.items():
+            if not key:
+                continue
+
+            competitor = competitors.get(key)
+            display = project.company_name if key == main_key else (competitor.name if competitor else variants[0])
+            aliases = sorted({variant for variant in variants if variant != display})
+            brand = TrackedBrand.objects.create(
+                project=project,
+                name=display,
+                key=key,
+                aliases=aliases,
+                is_main_brand=key == main_key,
+                competitor=competitor
+            )
+
+            spelled = [display] + aliases
+            BrandMention.objects.filter(response__project=project, brand_name__in=spelled).update(brand=brand)
+            VisibilityScore.objects.filter(project=project, brand_name__in=spelled).update(brand=brand)
+
+            # Spellings of one brand may have produced several score rows; keep the latest
+            duplicate_scores = list(
+                VisibilityScore.objects.filter(brand=brand).order_by('-id').values_list('id', flat=True)[1:]
+            )
+            VisibilityScore.objects.filter(id__in=duplicate_scores).delete()
+
+    # Rows with an empty brand name cannot be attributed to any brand
+    BrandMention.objects.filter(brand__isnull=True).delete()
+    VisibilityScore.objects.filter(brand__isnull=True).delete()
+
+
+def restore_brand_names(apps, schema_editor):
+    BrandMention = apps.get_model('tracker', 'BrandMention')
+    VisibilityScore = apps.get_model('tracker', 'VisibilityScore')
+
+    for model in (BrandMention, VisibilityScore):
+        for row in model.objects.select_related('brand').iterator():
+            row.brand_name = row.brand.name
+            row.save(update_fields=['brand_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_adaptive_refresh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedBrand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('key', models.CharField(max_length=255)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+                ('is_main_brand', models.BooleanField(default=False)),
+                ('competitor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tracker.competitor')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracked_brands', to='tracker.visibilityproject')),
+            ],
+            options={
+                'ordering': ['-is_main_brand', 'name'],
+                'unique_together': {('project', 'key')},
+            },
+        ),
+        migrations.AddField(
+            model_name='brandmention',
+            name='brand',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='tracker.trackedbrand'),
+        ),
+        migrations.AddField(
+            model_name='visibilityscore',
+            name='brand',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='tracker.trackedbrand'),
+        ),
+        migrations.RunPython(create_tracked_brands, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='visibilityscore',
+            unique_together=set(),
+        ),
+        # Lets the reverse migration re-add brand_name to existing rows
+        migrations.AlterField(
+            model_name='brandmention',
+            name='brand_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='visibilityscore',
+            name='brand_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        # Runs on reverse only, once brand_name is back and before its unique constraint returns
+        migrations.RunPython(migrations.RunPython.noop, restore_brand_names),
+        migrations.RemoveField(
+            model_name='brandmention',
+            name='brand_name',
+        ),
+        migrations.RemoveField(
+            model_name='visibilityscore',
+            name='brand_name',
+        ),
+        migrations.AlterField(
+            model_name='brandmention',
+            name='brand',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='tracker.trackedbrand'),
+        ),
+        migrations.AlterField(
+            model_name='visibilityscore',
+            name='brand',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='tracker.trackedbrand'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='visibilityscore',
+            unique_together={('project', 'brand')},
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_tracked_brands'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='brandmention',
+            index=models.Index(fields=['response', 'position'], name='mention_response_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='brandmention',
+            index=models.Index(fields=['brand', 'response'], name='mention_brand_response_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executionlog',
+            index=models.Index(fields=['project', 'timestamp'], name='log_project_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitoringschedule',
+            index=models.Index(fields=['is_active', 'next_run_at'], name='schedule_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('is_selected', True)), fields=['project'], name='prompt_selected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promptresponse',
+            index=models.Index(fields=['project', 'status'], name='response_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promptresponse',
+            index=models.Index(condition=models.Q(('status', 'success')), fields=['prompt_key', 'model', 'completed_at'], name='response_shared_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['project', 'status'], name='run_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='runresponse',
+            index=models.Index(fields=['response', 'run'], name='run_response_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentscore',
+            index=models.Index(condition=models.Q(('sentiment', 'negative')), fields=['mention'], name='sentiment_negative_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visibilityscore',
+            index=models.Index(fields=['project', '-normalized_score'], name='score_project_rank_idx'),
+        ),
+    ]
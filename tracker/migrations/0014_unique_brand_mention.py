@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def drop_duplicate_mentions(apps, schema_editor):
+    """Keep the earliest-positioned mention of each brand per response"""
+    BrandMention = apps.get_model('tracker', 'BrandMention')
+
+    duplicates = BrandMention.objects.values('response_id', 'brand_id').annotate(
+        rows=Count('id')
+    ).filter(rows__gt=1)
+
+    for group in list(duplicates):
+        keep = BrandMention.objects.filter(
+            response_id=group['response_id'], brand_id=group['brand_id']
+        ).order_by('position', 'id').values_list('id', flat=True).first()
+        BrandMention.objects.filter(
+            response_id=group['response_id'], brand_id=group['brand_id']
+        ).exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_mentions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='brandmention',
+            unique_together={('response', 'brand')},
+        ),
+    ]
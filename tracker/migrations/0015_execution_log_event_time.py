@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_unique_brand_mention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='executionlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
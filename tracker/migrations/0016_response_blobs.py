@@ -0,0 +1,101 @@
+import hashlib
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def store(ResponseBlob, text, blobs):
+    encoded = text.encode('utf-8')
+    digest = hashlib.sha256(encoded).hexdigest()
+    if digest not in blobs:
+        blobs[digest] = ResponseBlob.objects.get_or_create(
+            digest=digest,
+            defaults={'data': zlib.compress(encoded, 6), 'size': len(encoded)}
+        )[0].id
+    return blobs[digest]
+
+
+def move_text_to_blobs(apps, schema_editor):
+    """Compress answers into deduplicated blobs; unchanged run versions point at their earlier version's blob"""
+    ResponseBlob = apps.get_model('tracker', 'ResponseBlob')
+    PromptResponse = apps.get_model('tracker', 'PromptResponse')
+    RunResponse = apps.get_model('tracker', 'RunResponse')
+    blobs = {}
+
+    for response_id, text in PromptResponse.objects.exclude(raw_response='').values_list('id', 'raw_response').iterator():
+        PromptResponse.objects.filter(id=response_id).update(blob_id=store(ResponseBlob, text, blobs))
+
+    last_blob = {}
+    versions = RunResponse.objects.order_by('response_id', 'run__number').values_list(
+        'id', 'response_id', 'content_hash', 'raw_response'
+    )
+    for version_id, response_id, digest, text in versions.iterator():
+        blob_id = store(ResponseBlob, text, blobs) if text else last_blob.get((response_id, digest))
+        if blob_id is not None:
+            last_blob[(response_id, digest)] = blob_id
+            RunResponse.objects.filter(id=version_id).update(blob_id=blob_id)
+
+
+def restore_text(apps, schema_editor):
+    """Inline the text again; run versions only keep it where the answer changed"""
+    ResponseBlob = apps.get_model('tracker', 'ResponseBlob')
+    PromptResponse = apps.get_model('tracker', 'PromptResponse')
+    RunResponse = apps.get_model('tracker', 'RunResponse')
+    texts = {blob_id: zlib.decompress(bytes(data)).decode('utf-8') for blob_id, data in ResponseBlob.objects.values_list('id', 'data')}
+
+    for response_id, blob_id in PromptResponse.objects.filter(blob__isnull=False).values_list('id', 'blob_id').iterator():
+        PromptResponse.objects.filter(id=response_id).update(raw_response=texts[blob_id])
+
+    for version_id, blob_id in RunResponse.objects.filter(blob__isnull=False, changed=True).values_list('id', 'blob_id').iterator():
+        RunResponse.objects.filter(id=version_id).update(raw_response=texts[blob_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_execution_log_event_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='promptresponse',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='tracker.responseblob'),
+        ),
+        migrations.AddField(
+            model_name='runresponse',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='tracker.responseblob'),
+        ),
+        # Lets the reverse migration re-add raw_response to existing rows
+        migrations.AlterField(
+            model_name='promptresponse',
+            name='raw_response',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='runresponse',
+            name='raw_response',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(move_text_to_blobs, restore_text),
+        migrations.RemoveField(
+            model_name='promptresponse',
+            name='raw_response',
+        ),
+        migrations.RemoveField(
+            model_name='runresponse',
+            name='raw_response',
+        ),
+    ]
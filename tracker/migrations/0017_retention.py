@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_response_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='log_summary',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='visibilityproject',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
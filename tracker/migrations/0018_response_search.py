@@ -0,0 +1,46 @@
+import zlib
+
+from django.db import migrations
+
+SEARCH_TABLE = 'tracker_response_search'
+
+
+def create_search_index(apps, schema_editor):
+    """Full-text index over every blob's text: FTS5 on SQLite, a tsvector with a GIN index on PostgreSQL"""
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(text, content='', tokenize='unicode61 remove_diacritics 2')"
+        )
+        insert = f'INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (%s, %s)'
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {SEARCH_TABLE} ('
+            f'blob_id bigint PRIMARY KEY REFERENCES tracker_responseblob (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)')
+        insert = f"INSERT INTO {SEARCH_TABLE} (blob_id, document) VALUES (%s, to_tsvector('simple', %s))"
+    else:
+        return
+
+    ResponseBlob = apps.get_model('tracker', 'ResponseBlob')
+    with connection.cursor() as cursor:
+        for blob_id, data in ResponseBlob.objects.values_list('id', 'data').iterator():
+            cursor.execute(insert, [blob_id, zlib.decompress(bytes(data)).decode('utf-8')])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0017_retention'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
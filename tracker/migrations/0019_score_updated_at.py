@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0018_response_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visibilityscore',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0019_score_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='brandmention',
+            name='competitor',
+        ),
+        migrations.RemoveField(
+            model_name='brandmention',
+            name='is_main_brand',
+        ),
+    ]
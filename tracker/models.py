@@ -1,3 +1,5 @@
+import hashlib
+import zlib
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -28,10 +30,15 @@ class VisibilityProject(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(blank=True, null=True)
+    # Raw responses, mentions and logs moved to an archive file (see tracker/retention.py)
+    archived_at = models.DateTimeField(blank=True, null=True)
     
     # Impersonation mode
     is_competitor_view = models.BooleanField(default=False)
     competitor_brand_id = models.IntegerField(blank=True, null=True)
+    source_project = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='impersonations'
+    )  # Project whose raw responses are shared
     
     class Meta:
         ordering = ['-created_at']
@@ -65,6 +72,23 @@ class Competitor(models.Model):
         return f"{self.name} (Competitor)"
 
 
+class TrackedBrand(models.Model):
+    """Canonical brand of a project, referenced by mentions and scores"""
+    project = models.ForeignKey(VisibilityProject, on_delete=models.CASCADE, related_name='tracked_brands')
+    name = models.CharField(max_length=255)  # Display name
+    key = models.CharField(max_length=255)  # Case-folded, whitespace-collapsed name
+    aliases = models.JSONField(default=list, blank=True)  # Other spellings matched as this brand
+    is_main_brand = models.BooleanField(default=False)
+    competitor = models.ForeignKey(Competitor, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['project', 'key']
+        ordering = ['-is_main_brand', 'name']
+    
+    def __str__(self):
+        return self.name
+
+
 class AIModel(models.Model):
     """Available AI models for querying"""
     MODEL_TYPES = [
@@ -92,6 +116,9 @@ class Prompt(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['project'], condition=models.Q(is_selected=True), name='prompt_selected_idx'),
+        ]
     
     def __str__(self):
         return self.text[:100]
@@ -107,7 +134,66 @@ class ModelSelection(models.Model):
         unique_together = ['project', 'model']
 
 
-class PromptResponse(models.Model):
+class ResponseBlob(models.Model):
+    """Compressed raw answer text, stored once per distinct text and shared by every response with it"""
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of the exact text
+    data = models.BinaryField()  # zlib-compressed UTF-8
+    size = models.IntegerField(default=0)  # Uncompressed bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    @staticmethod
+    def compress(text: str) -> bytes:
+        return zlib.compress(text.encode('utf-8'), 6)
+    
+    @staticmethod
+    def decompress(data) -> str:
+        return zlib.decompress(bytes(data)).decode('utf-8') if data else ''
+    
+    @classmethod
+    def store(cls, text: str) -> 'ResponseBlob':
+        """Blob for `text`, created on first sight"""
+        encoded = text.encode('utf-8')
+        blob, _ = cls.objects.get_or_create(
+            digest=hashlib.sha256(encoded).hexdigest(),
+            defaults={'data': zlib.compress(encoded, 6), 'size': len(encoded)}
+        )
+        return blob
+    
+    @property
+    def text(self) -> str:
+        return self.decompress(self.data)
+    
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.size} bytes)"
+
+
+class BlobTextMixin:
+    """
+    `raw_response` backed by a ResponseBlob: decompressed on first access, written to the blob store on save
+    Querysets never load the text unless they select the blob.
+    """
+    
+    @property
+    def raw_response(self) -> str:
+        if getattr(self, '_raw_text', None) is None:
+            self._raw_text = self.blob.text if self.blob_id else ''
+        return self._raw_text
+    
+    @raw_response.setter
+    def raw_response(self, text: str):
+        self._raw_text = text or ''
+        self._raw_text_dirty = True
+    
+    def save(self, *args, **kwargs):
+        if getattr(self, '_raw_text_dirty', False):
+            self.blob = ResponseBlob.store(self._raw_text) if self._raw_text else None
+            self._raw_text_dirty = False
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'blob'}
+        super().save(*args, **kwargs)
+
+
+class PromptResponse(BlobTextMixin, models.Model):
     """Raw responses from AI models"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -120,17 +206,43 @@ class PromptResponse(models.Model):
     prompt = models.ForeignKey(Prompt, on_delete=models.CASCADE, related_name='responses')
     model = models.ForeignKey(AIModel, on_delete=models.CASCADE)
     
-    raw_response = models.TextField(blank=True)
+    # Answer text lives in the blob store; read it through `raw_response`
+    blob = models.ForeignKey(ResponseBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True)
     retry_count = models.IntegerField(default=0)
     
+    # Shared response store lookup: hash of the normalized prompt text
+    prompt_key = models.CharField(max_length=64, blank=True, db_index=True)
+    temperature = models.FloatField(default=0.7)
+    
+    # Set when the raw answer was reused from another project's response
+    source_response = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='shared_copies'
+    )
+    
+    # Run that last refreshed this answer, and a hash of the answer text to detect changes
+    run = models.ForeignKey('Run', on_delete=models.SET_NULL, null=True, blank=True, related_name='responses')
+    content_hash = models.CharField(max_length=64, blank=True)
+    
+    # EWMA of how much the mention ranking moves between refreshes (0 stable - 1 reshuffled)
+    volatility = models.FloatField(default=1.0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     
     class Meta:
         unique_together = ['prompt', 'model']
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['project', 'status'], name='response_project_status_idx'),
+            # Shared response store lookups only ever consider successful answers
+            models.Index(
+                fields=['prompt_key', 'model', 'completed_at'],
+                condition=models.Q(status='success'),
+                name='response_shared_lookup_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.model.display_name} - {self.prompt.text[:50]}"
@@ -139,19 +251,20 @@ class PromptResponse(models.Model):
 class BrandMention(models.Model):
     """Extracted brand mentions from responses"""
     response = models.ForeignKey(PromptResponse, on_delete=models.CASCADE, related_name='mentions')
-    brand_name = models.CharField(max_length=255)
+    brand = models.ForeignKey(TrackedBrand, on_delete=models.CASCADE, related_name='mentions')
     position = models.IntegerField()  # 1st, 2nd, 3rd mention
     context = models.TextField(blank=True)  # Surrounding text
     
-    # Competitors or main brand
-    is_main_brand = models.BooleanField(default=False)
-    competitor = models.ForeignKey(Competitor, on_delete=models.SET_NULL, null=True, blank=True)
-    
     class Meta:
         ordering = ['position']
+        unique_together = ['response', 'brand']
+        indexes = [
+            models.Index(fields=['response', 'position'], name='mention_response_position_idx'),
+            models.Index(fields=['brand', 'response'], name='mention_brand_response_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.brand_name} at position {self.position}"
+        return f"{self.brand.name} at position {self.position}"
 
 
 class SentimentScore(models.Model):
@@ -175,17 +288,22 @@ class SentimentScore(models.Model):
     reasoning = models.TextField(blank=True)  # Why this sentiment
     confidence = models.FloatField(default=1.0)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['mention'], condition=models.Q(sentiment='negative'), name='sentiment_negative_idx'),
+        ]
+    
     def get_weight(self):
         return self.SENTIMENT_WEIGHTS.get(self.sentiment, 0.8)
     
     def __str__(self):
-        return f"{self.mention.brand_name} - {self.sentiment}"
+        return f"{self.mention.brand.name} - {self.sentiment}"
 
 
 class VisibilityScore(models.Model):
     """Aggregated visibility scores per brand"""
     project = models.ForeignKey(VisibilityProject, on_delete=models.CASCADE, related_name='visibility_scores')
-    brand_name = models.CharField(max_length=255)
+    brand = models.ForeignKey(TrackedBrand, on_delete=models.CASCADE, related_name='scores')
     is_main_brand = models.BooleanField(default=False)
     competitor = models.ForeignKey(Competitor, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -204,13 +322,17 @@ class VisibilityScore(models.Model):
     prompts_appeared_in = models.IntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Part of the report's ETag
     
     class Meta:
-        unique_together = ['project', 'brand_name']
+        unique_together = ['project', 'brand']
         ordering = ['-normalized_score']
+        indexes = [
+            models.Index(fields=['project', '-normalized_score'], name='score_project_rank_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.brand_name} - {self.normalized_score:.1f}%"
+        return f"{self.brand.name} - {self.normalized_score:.1f}%"
 
 
 class DetailedReport(models.Model):
@@ -223,6 +345,8 @@ class DetailedReport(models.Model):
     model_wise_analysis = models.JSONField(default=dict)
     negative_sentiment_analysis = models.JSONField(default=dict)
     research_sources = models.JSONField(default=list)
+    source_domains = models.JSONField(default=list)  # Citation counts per domain by model and brand
+    perspective_matrix = models.JSONField(default=dict)  # Every brand treated as main brand
     
     # Insights and recommendations
     why_competitors_win = models.TextField(blank=True)
@@ -235,12 +359,159 @@ class DetailedReport(models.Model):
     seo_pr_recommendations = models.JSONField(default=list)
     messaging_improvements = models.JSONField(default=list)
     
+    # Section name -> hash of its inputs, used to skip unchanged sections on re-runs
+    section_fingerprints = models.JSONField(default=dict)
+    
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Report for {self.project.company_name}"
 
 
+class Run(models.Model):
+    """One execution of modules 2 and 3 for a project"""
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    TRIGGER_CHOICES = [
+        ('manual', 'Manual'),
+        ('scheduled', 'Scheduled'),
+    ]
+    
+    project = models.ForeignKey(VisibilityProject, on_delete=models.CASCADE, related_name='runs')
+    number = models.IntegerField()  # Sequence within the project
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES, default='manual')
+    stats = models.JSONField(default=dict, blank=True)  # Refreshed/changed/unchanged response counts
+    log_summary = models.JSONField(default=dict, blank=True)  # Execution logs compacted by retention
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        unique_together = ['project', 'number']
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['project', 'status'], name='run_project_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Run #{self.number} for {self.project.company_name} ({self.status})"
+
+
+class RunResponse(BlobTextMixin, models.Model):
+    """Answer of one prompt x model as seen by a run; unchanged answers share their blob with earlier runs"""
+    run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='run_responses')
+    response = models.ForeignKey(PromptResponse, on_delete=models.CASCADE, related_name='versions')
+    content_hash = models.CharField(max_length=64)
+    blob = models.ForeignKey(ResponseBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    changed = models.BooleanField(default=True)
+    mention_ranking = models.JSONField(default=list)  # [[brand, position, sentiment], ...]
+    
+    class Meta:
+        unique_together = ['run', 'response']
+        indexes = [
+            models.Index(fields=['response', 'run'], name='run_response_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Run #{self.run.number} - response {self.response_id}"
+
+
+class RunScore(models.Model):
+    """Visibility score of a brand as of a run"""
+    run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='scores')
+    brand_name = models.CharField(max_length=255)
+    is_main_brand = models.BooleanField(default=False)
+    
+    frequency_score = models.FloatField(default=0.0)
+    prominence_score = models.FloatField(default=0.0)
+    sentiment_score = models.FloatField(default=0.0)
+    model_coverage_score = models.FloatField(default=0.0)
+    normalized_score = models.FloatField(default=0.0)
+    total_mentions = models.IntegerField(default=0)
+    prompts_appeared_in = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['run', 'brand_name']
+        ordering = ['-normalized_score']
+    
+    def __str__(self):
+        return f"{self.brand_name} - {self.normalized_score:.1f}% (run #{self.run.number})"
+
+
+class BrandRollup(models.Model):
+    """Per-brand score aggregates over completed runs in a day or week, used for trend charts"""
+    PERIOD_CHOICES = [
+        ('day', 'Daily'),
+        ('week', 'Weekly'),
+    ]
+    
+    project = models.ForeignKey(VisibilityProject, on_delete=models.CASCADE, related_name='rollups')
+    brand_name = models.CharField(max_length=255)
+    is_main_brand = models.BooleanField(default=False)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    
+    run_count = models.IntegerField(default=0)
+    avg_score = models.FloatField(default=0.0)
+    min_score = models.FloatField(default=0.0)
+    max_score = models.FloatField(default=0.0)
+    avg_frequency = models.FloatField(default=0.0)
+    avg_prominence = models.FloatField(default=0.0)
+    avg_sentiment = models.FloatField(default=0.0)
+    total_mentions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['project', 'brand_name', 'period', 'period_start']
+        ordering = ['period_start']
+    
+    def __str__(self):
+        return f"{self.brand_name} {self.period} {self.period_start}: {self.avg_score:.1f}%"
+
+
+class MonitoringSchedule(models.Model):
+    """Cron-like schedule for re-running a project's visibility check"""
+    project = models.OneToOneField(VisibilityProject, on_delete=models.CASCADE, related_name='schedule')
+    cron_expression = models.CharField(max_length=100, default='0 6 * * *')  # minute hour day month weekday (UTC)
+    stagger_minutes = models.IntegerField(default=30)  # Max per-project offset added to each fire time
+    call_budget = models.IntegerField(blank=True, null=True)  # Max model queries per scheduled run (blank = all)
+    is_active = models.BooleanField(default=True)
+    
+    next_run_at = models.DateTimeField(blank=True, null=True)
+    last_run_at = models.DateTimeField(blank=True, null=True)
+    last_run = models.ForeignKey(Run, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_skip_reason = models.CharField(max_length=255, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['next_run_at']
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_at'], name='schedule_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project.company_name}: {self.cron_expression}"
+
+
+class ProviderUsage(models.Model):
+    """Model queries sent to a provider per day, checked against the global daily budget"""
+    provider = models.CharField(max_length=50)  # AIModel.name
+    day = models.DateField()
+    calls = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['provider', 'day']
+    
+    def __str__(self):
+        return f"{self.provider} {self.day}: {self.calls} calls"
+
+
 class ExecutionLog(models.Model):
     """Track execution flow and errors"""
     LOG_LEVELS = [
@@ -254,10 +525,36 @@ class ExecutionLog(models.Model):
     module = models.CharField(max_length=50)  # module1, module2, module3
     message = models.TextField()
     details = models.JSONField(default=dict, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens; buffered entries are written later
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['project', 'timestamp'], name='log_project_time_idx'),
+        ]
     
     def __str__(self):
         return f"[{self.level}] {self.module} - {self.message[:50]}"
+
+
+class WorkflowCache(models.Model):
+    """Module 1 LLM results shared by projects in the same industry"""
+    KIND_CHOICES = [
+        ('competitors', 'Competitor Discovery'),
+        ('prompts', 'Prompt Generation'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    cache_key = models.CharField(max_length=64)  # Hash of normalized industry + company
+    area_of_work = models.CharField(max_length=255)
+    company_name = models.CharField(max_length=255)
+    payload = models.JSONField(default=list)
+    hit_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['kind', 'cache_key']
+    
+    def __str__(self):
+        return f"{self.kind} cache for {self.area_of_work} / {self.company_name}"
@@ -7,31 +7,50 @@ import json
 import logging
 from typing import List, Dict, Tuple
 from django.db import transaction
+from django.utils import timezone
 
 from .ai_config import AIModelConfig, invoke_chatgpt
+from .response_store import SharedResponseStore, prompt_key
+from .prompt_dedup import find_near_duplicates, estimate_saved_calls
+from .runs import content_hash, start_run, snapshot_run, finish_run
+from .provider_budget import try_consume_call
+from .brands import sync_project_brands, search_terms
+from .refresh_policy import select_due_pairs
+from .db_writer import write, bulk_upsert
+from .execution_log import ExecutionLogBuffer
+from .report_snapshot import invalidate_snapshot
 from .models import (
     VisibilityProject, Prompt, AIModel, ModelSelection,
     PromptResponse, BrandMention, SentimentScore, VisibilityScore,
-    ExecutionLog, Competitor
+    ExecutionLog, Competitor, Run, MonitoringSchedule, TrackedBrand
 )
 
 logger = logging.getLogger(__name__)
 
+# Score columns written on every recalculation
+SCORE_FIELDS = [
+    'frequency_score', 'prominence_score', 'sentiment_score', 'model_coverage_score',
+    'raw_score', 'normalized_score', 'total_mentions', 'prompts_appeared_in'
+]
+
 
 class VisibilityCheckEngine:
     """Core engine for visibility checking and scoring"""
     
-    def __init__(self, project_id: int):
+    QUERY_TEMPERATURE = 0.7
+    SENTIMENT_FLUSH_SIZE = 50
+    
+    def __init__(self, project_id: int, run_id: int = None):
         self.project = VisibilityProject.objects.get(id=project_id)
+        self.run_obj = Run.objects.get(id=run_id, project=self.project) if run_id else write(start_run, self.project)
         self.brand_name = self.project.company_name
-        self.competitor_names = list(
-            self.project.competitors.values_list('name', flat=True)
-        )
+        self.response_store = SharedResponseStore() if SharedResponseStore.is_enabled() else None
+        self.log = ExecutionLogBuffer()
     
     def run(self):
         """Execute the full visibility check"""
         try:
-            ExecutionLog.objects.create(
+            self.log.add(
                 project=self.project,
                 module='module2',
                 level='info',
@@ -39,28 +58,35 @@ class VisibilityCheckEngine:
             )
             
             self.project.status = 'checking'
-            self.project.save()
+            write(self.project.save)
             
             # Step 1: Query all selected models with all selected prompts
             self.query_models()
+            self.log.flush()
             
             # Step 2: Extract brand mentions from responses
             self.extract_mentions()
+            self.log.flush()
             
             # Step 3: Analyze sentiment for each mention
             self.analyze_sentiment()
+            self.log.flush()
             
             # Step 4: Calculate visibility scores
             self.calculate_scores()
             
+            # Version this run's answers and scores
+            stats = write(snapshot_run, self.run_obj)
+            
             self.project.status = 'analyzing'
-            self.project.save()
+            write(self.project.save)
             
-            ExecutionLog.objects.create(
+            self.log.add(
                 project=self.project,
                 module='module2',
                 level='info',
-                message='Visibility check completed successfully'
+                message='Visibility check completed successfully',
+                details={'run_id': self.run_obj.id, **stats}
             )
             
             return True
@@ -68,9 +94,10 @@ class VisibilityCheckEngine:
         except Exception as e:
             logger.exception("Error in VisibilityCheckEngine")
             self.project.status = 'failed'
-            self.project.save()
+            write(self.project.save)
+            write(finish_run, self.run_obj, 'failed')
             
-            ExecutionLog.objects.create(
+            self.log.add(
                 project=self.project,
                 module='module2',
                 level='error',
@@ -78,6 +105,9 @@ class VisibilityCheckEngine:
             )
             
             return False
+        
+        finally:
+            self.log.close()
     
     def query_models(self):
         """Query all selected models with all selected prompts"""
@@ -92,63 +122,94 @@ class VisibilityCheckEngine:
             logger.warning("No models selected")
             return
         
+        self.flag_near_duplicate_prompts(selected_prompts, selected_models.count())
+        
+        if self.project.source_project_id:
+            # Impersonation: the raw answers are identical, only the main brand differs
+            self.share_source_responses(selected_prompts, selected_models)
+        
         total = selected_prompts.count() * selected_models.count()
         completed = 0
+        due = self._due_pairs(selected_prompts, selected_models)
         
         for prompt in selected_prompts:
+            key = prompt_key(prompt.text)
+            
             for model_selection in selected_models:
                 model = model_selection.model
                 
+                if due is not None and (prompt.id, model.id) not in due:
+                    # Stable answer kept from an earlier run to stay within the call budget
+                    completed += 1
+                    continue
+                
                 try:
                     # Check if response already exists
-                    response_obj, created = PromptResponse.objects.get_or_create(
+                    response_obj, created = write(
+                        PromptResponse.objects.get_or_create,
                         project=self.project,
                         prompt=prompt,
                         model=model,
                         defaults={'status': 'pending'}
                     )
                     
-                    if not created and response_obj.status == 'success':
-                        # Already have successful response
+                    if not created and response_obj.status == 'success' and response_obj.run_id == self.run_obj.id:
+                        # Already refreshed in this run
+                        completed += 1
+                        continue
+                    
+                    response_obj.prompt_key = key
+                    response_obj.temperature = self.QUERY_TEMPERATURE
+                    
+                    if self.response_store and self._reuse_shared_response(response_obj, model):
                         completed += 1
                         continue
                     
                     # Query the model
-                    ai_model = AIModelConfig.get_model_by_name(model.name, temperature=0.7)
-                    success, response, error = AIModelConfig.invoke_with_retry(
-                        ai_model, 
-                        prompt.text
-                    )
+                    coalesced_with = None
+                    if self.response_store:
+                        (success, response, error), coalesced_with = self.response_store.coalesce(
+                            key,
+                            model.name,
+                            self.QUERY_TEMPERATURE,
+                            self.project.id,
+                            lambda: self._invoke_model(model, prompt)
+                        )
+                    else:
+                        success, response, error = self._invoke_model(model, prompt)
                     
                     if success:
-                        response_obj.raw_response = response
-                        response_obj.status = 'success'
-                        response_obj.error_message = ''
+                        self._store_answer(response_obj, response)
+                        response_obj.completed_at = timezone.now()
                         
-                        ExecutionLog.objects.create(
+                        self.log.add(
                             project=self.project,
                             module='module2',
                             level='info',
-                            message=f'Successfully queried {model.display_name}'
+                            message=f'Successfully queried {model.display_name}',
+                            sample=True,
+                            details={'coalesced_with_project_id': coalesced_with} if coalesced_with else {}
                         )
                     else:
-                        response_obj.status = 'failed'
+                        # A previous run's answer stays in place (carried forward) if this refresh fails
+                        if response_obj.status != 'success':
+                            response_obj.status = 'failed'
                         response_obj.error_message = error
                         response_obj.retry_count += 1
                         
-                        ExecutionLog.objects.create(
+                        self.log.add(
                             project=self.project,
                             module='module2',
                             level='warning',
                             message=f'Failed to query {model.display_name}: {error}'
                         )
                     
-                    response_obj.save()
+                    write(response_obj.save)
                     completed += 1
                     
                 except Exception as e:
                     logger.exception(f"Error querying {model.name}")
-                    ExecutionLog.objects.create(
+                    self.log.add(
                         project=self.project,
                         module='module2',
                         level='error',
@@ -156,48 +217,230 @@ class VisibilityCheckEngine:
                     )
                     completed += 1
         
-        ExecutionLog.objects.create(
+        self.log.add(
             project=self.project,
             module='module2',
             level='info',
             message=f'Queried models: {completed}/{total} completed'
         )
     
+    def _due_pairs(self, selected_prompts, selected_models):
+        """
+        (prompt id, model id) pairs to query in a scheduled run with a call budget
+        
+        Returns: None when every pair should be refreshed
+        """
+        if self.run_obj.trigger != 'scheduled':
+            return None
+        
+        budget = MonitoringSchedule.objects.filter(project=self.project).values_list('call_budget', flat=True).first()
+        if budget is None:
+            return None
+        
+        pairs = [
+            (prompt_id, model_id)
+            for prompt_id in selected_prompts.values_list('id', flat=True)
+            for model_id in selected_models.values_list('model_id', flat=True)
+        ]
+        due = select_due_pairs(self.project.id, pairs, budget)
+        
+        self.log.add(
+            project=self.project,
+            module='module2',
+            level='info',
+            message=f'Refreshing {len(due)}/{len(pairs)} answers within call budget',
+            details={'call_budget': budget, 'carried_forward': len(pairs) - len(due)}
+        )
+        return due
+    
+    def flag_near_duplicate_prompts(self, selected_prompts, model_count: int):
+        """
+        Log paraphrased prompts that are still selected and what merging them would save
+        Merging is the user's choice on the validation page; the selection is never changed here.
+        """
+        groups = find_near_duplicates(selected_prompts.values_list('id', 'text'))
+        if not groups:
+            return
+        
+        duplicate_count = sum(len(group) - 1 for group in groups)
+        self.log.add(
+            project=self.project,
+            module='module2',
+            level='info',
+            message=f'{duplicate_count} selected prompts are near-duplicates; merging them would save calls',
+            details={
+                'groups': groups,
+                'saved_calls': estimate_saved_calls(groups, model_count)
+            }
+        )
+    
+    def _invoke_model(self, model: AIModel, prompt: Prompt) -> Tuple[bool, str, str]:
+        """Send one prompt to one provider"""
+        if not write(try_consume_call, model.name):
+            return False, '', f'Daily call budget for {model.name} exhausted'
+        
+        ai_model = AIModelConfig.get_model_by_name(model.name, temperature=self.QUERY_TEMPERATURE)
+        return AIModelConfig.invoke_with_retry(ai_model, prompt.text)
+    
+    def _store_answer(self, response_obj: PromptResponse, text: str):
+        """Set a fresh answer for this run; mentions are only re-extracted when the text changed"""
+        digest = content_hash(text)
+        previous = response_obj.content_hash or (content_hash(response_obj.raw_response) if response_obj.raw_response else '')
+        if response_obj.pk and previous and previous != digest:
+            # Sentiment rows cascade with the mentions
+            write(response_obj.mentions.all().delete)
+        
+        response_obj.raw_response = text
+        response_obj.content_hash = digest
+        response_obj.status = 'success'
+        response_obj.error_message = ''
+        response_obj.run = self.run_obj
+    
+    def _reuse_shared_response(self, response_obj: PromptResponse, model: AIModel) -> bool:
+        """Fill the response from another project's fresh answer, if the store has one"""
+        shared = self.response_store.lookup(
+            response_obj.prompt_key,
+            model,
+            self.QUERY_TEMPERATURE,
+            project_id=self.project.id
+        )
+        source_id = (shared.source_response_id or shared.id) if shared else None
+        if source_id is None or source_id == response_obj.id:
+            return False
+        
+        self._store_answer(response_obj, shared.raw_response)
+        response_obj.source_response_id = source_id
+        response_obj.completed_at = shared.completed_at
+        write(response_obj.save)
+        
+        self.log.add(
+            project=self.project,
+            module='module2',
+            level='info',
+            message=f'Reused shared response for {model.display_name}',
+            sample=True,
+            details={
+                'source_response_id': response_obj.source_response_id,
+                'source_project_id': shared.project_id,
+                'source_completed_at': shared.completed_at.isoformat()
+            }
+        )
+        return True
+    
+    def share_source_responses(self, selected_prompts, selected_models):
+        """Copy successful responses from the source project instead of re-querying"""
+        source_responses = {
+            (response.prompt.text, response.model_id): response
+            for response in PromptResponse.objects.filter(
+                project_id=self.project.source_project_id,
+                status='success'
+            ).select_related('prompt', 'blob')
+        }
+        
+        shared = 0
+        for prompt in selected_prompts:
+            for model_selection in selected_models:
+                source = source_responses.get((prompt.text, model_selection.model_id))
+                if source is None:
+                    continue
+                
+                response_obj, created = write(
+                    PromptResponse.objects.get_or_create,
+                    project=self.project,
+                    prompt=prompt,
+                    model_id=model_selection.model_id,
+                    defaults={'status': 'pending'}
+                )
+                if response_obj.status == 'success' and response_obj.run_id == self.run_obj.id:
+                    continue
+                
+                self._store_answer(response_obj, source.raw_response)
+                response_obj.source_response = source
+                response_obj.prompt_key = source.prompt_key or prompt_key(prompt.text)
+                response_obj.temperature = source.temperature
+                response_obj.completed_at = source.completed_at or timezone.now()
+                write(response_obj.save)
+                shared += 1
+        
+        self.log.add(
+            project=self.project,
+            module='module2',
+            level='info',
+            message=f'Shared {shared} responses from source project',
+            details={'source_project_id': self.project.source_project_id}
+        )
+    
+    def _source_sentiments(self) -> Dict[Tuple[str, int, str], Dict]:
+        """Sentiment results from the source project keyed by (prompt text, model, brand)"""
+        if not self.project.source_project_id:
+            return {}
+        
+        rows = SentimentScore.objects.filter(
+            mention__response__project_id=self.project.source_project_id
+        ).values(
+            'mention__response__prompt__text',
+            'mention__response__model_id',
+            'mention__brand__key',
+            'sentiment',
+            'reasoning',
+            'confidence'
+        )
+        
+        return {
+            (
+                row['mention__response__prompt__text'],
+                row['mention__response__model_id'],
+                row['mention__brand__key']
+            ): {
+                'sentiment': row['sentiment'],
+                'reasoning': row['reasoning'],
+                'confidence': row['confidence']
+            }
+            for row in rows
+        }
+    
     def extract_mentions(self):
         """Extract brand mentions from responses"""
         responses = PromptResponse.objects.filter(
             project=self.project,
             status='success'
-        )
+        ).select_related('blob')
         
-        all_brands = [self.brand_name] + self.competitor_names
+        terms = search_terms(sync_project_brands(self.project))
+        brand_by_surface = {surface.lower(): brand for surface, brand in terms}
+        rows = []
         
         for response in responses:
             try:
-                mentions = self._find_brand_mentions(response.raw_response, all_brands)
+                mentions = self._find_brand_mentions(response.raw_response, [surface for surface, _ in terms])
                 
-                for position, (brand, context) in enumerate(mentions, start=1):
-                    is_main = (brand.lower() == self.brand_name.lower())
-                    competitor_obj = None
-                    
-                    if not is_main:
-                        competitor_obj = self.project.competitors.filter(
-                            name__iexact=brand
-                        ).first()
+                # Aliases of one brand collapse onto its first appearance
+                seen = set()
+                position = 0
+                for surface, context in mentions:
+                    brand = brand_by_surface[surface.lower()]
+                    if brand.id in seen:
+                        continue
+                    seen.add(brand.id)
+                    position += 1
                     
-                    BrandMention.objects.get_or_create(
+                    rows.append(BrandMention(
                         response=response,
-                        brand_name=brand,
+                        brand=brand,
                         position=position,
-                        defaults={
-                            'context': context,
-                            'is_main_brand': is_main,
-                            'competitor': competitor_obj
-                        }
-                    )
+                        context=context
+                    ))
                 
             except Exception as e:
                 logger.exception(f"Error extracting mentions from response {response.id}")
+        
+        # Existing mentions keep their id (and sentiment); only position and context are refreshed
+        bulk_upsert(
+            BrandMention,
+            rows,
+            unique_fields=['response', 'brand'],
+            update_fields=['position', 'context']
+        )
     
     def _find_brand_mentions(self, text: str, brands: List[str]) -> List[Tuple[str, str]]:
         """
@@ -238,7 +481,10 @@ class VisibilityCheckEngine:
         """Analyze sentiment for each brand mention using ChatGPT"""
         mentions = BrandMention.objects.filter(
             response__project=self.project
-        ).select_related('response')
+        ).select_related('response', 'response__prompt', 'response__blob', 'brand')
+        
+        source_sentiments = self._source_sentiments()
+        pending = []
         
         for mention in mentions:
             try:
@@ -246,9 +492,19 @@ class VisibilityCheckEngine:
                 if hasattr(mention, 'sentiment'):
                     continue
                 
+                # Impersonation: same answer and brand, so the source sentiment holds
+                shared = source_sentiments.get((
+                    mention.response.prompt.text,
+                    mention.response.model_id,
+                    mention.brand.key
+                ))
+                if shared:
+                    pending.append(SentimentScore(mention=mention, **shared))
+                    continue
+                
                 prompt = f"""Analyze the sentiment of how this brand is mentioned:
 
-Brand: {mention.brand_name}
+Brand: {mention.brand.name}
 Context: {mention.context}
 Full response: {mention.response.raw_response[:500]}
 
@@ -275,35 +531,49 @@ Return ONLY a JSON object:
                         sentiment_value = result.get('sentiment', 'neutral')
                         reasoning = result.get('reasoning', '')
                         
-                        SentimentScore.objects.create(
+                        pending.append(SentimentScore(
                             mention=mention,
                             sentiment=sentiment_value,
                             reasoning=reasoning,
                             confidence=1.0
-                        )
+                        ))
                     except json.JSONDecodeError:
                         # Fallback to neutral
-                        SentimentScore.objects.create(
+                        pending.append(SentimentScore(
                             mention=mention,
                             sentiment='neutral',
                             reasoning='Failed to parse sentiment',
                             confidence=0.5
-                        )
+                        ))
                 else:
                     # Fallback to neutral on error
-                    SentimentScore.objects.create(
+                    pending.append(SentimentScore(
                         mention=mention,
                         sentiment='neutral',
                         reasoning=f'Error: {error}',
                         confidence=0.3
-                    )
+                    ))
+                
+                if len(pending) >= self.SENTIMENT_FLUSH_SIZE:
+                    self._save_sentiments(pending)
+                    pending = []
                     
             except Exception as e:
                 logger.exception(f"Error analyzing sentiment for mention {mention.id}")
+        
+        self._save_sentiments(pending)
+    
+    def _save_sentiments(self, scores: List[SentimentScore]):
+        bulk_upsert(
+            SentimentScore,
+            scores,
+            unique_fields=['mention'],
+            update_fields=['sentiment', 'reasoning', 'confidence']
+        )
     
     def calculate_scores(self):
         """Calculate visibility scores for all brands"""
-        all_brands = [self.brand_name] + self.competitor_names
+        brands = sync_project_brands(self.project)
         
         # Get all successful responses
         total_responses = PromptResponse.objects.filter(
@@ -321,7 +591,8 @@ Return ONLY a JSON object:
             for ms in self.project.selected_models.filter(is_selected=True)
         }
         
-        for brand in all_brands:
+        rows = []
+        for brand in brands.values():
             try:
                 score = self._calculate_brand_score(
                     brand, 
@@ -329,30 +600,29 @@ Return ONLY a JSON object:
                     selected_models
                 )
                 
-                is_main = (brand.lower() == self.brand_name.lower())
-                competitor_obj = None
-                
-                if not is_main:
-                    competitor_obj = self.project.competitors.filter(
-                        name__iexact=brand
-                    ).first()
-                
-                VisibilityScore.objects.update_or_create(
+                rows.append(VisibilityScore(
                     project=self.project,
-                    brand_name=brand,
-                    defaults={
-                        'is_main_brand': is_main,
-                        'competitor': competitor_obj,
-                        **score
-                    }
-                )
+                    brand=brand,
+                    is_main_brand=brand.is_main_brand,
+                    competitor_id=brand.competitor_id,
+                    **score
+                ))
                 
             except Exception as e:
-                logger.exception(f"Error calculating score for brand {brand}")
+                logger.exception(f"Error calculating score for brand {brand.name}")
+        
+        bulk_upsert(
+            VisibilityScore,
+            rows,
+            unique_fields=['project', 'brand'],
+            update_fields=['is_main_brand', 'competitor', 'updated_at', *SCORE_FIELDS]
+        )
+        # Bulk writes skip post_save, so the cached report is dropped here
+        invalidate_snapshot(self.project.id)
     
     def _calculate_brand_score(
         self, 
-        brand: str, 
+        brand: TrackedBrand, 
         total_responses: int,
         model_weights: Dict[str, float]
     ) -> Dict:
@@ -360,8 +630,8 @@ Return ONLY a JSON object:
         
         mentions = BrandMention.objects.filter(
             response__project=self.project,
-            brand_name__iexact=brand
-        ).select_related('response', 'sentiment')
+            brand=brand
+        ).select_related('response', 'response__model', 'sentiment')
         
         if not mentions.exists():
             return {
@@ -427,7 +697,7 @@ Return ONLY a JSON object:
         }
 
 
-def run_module2(project_id: int) -> bool:
-    """Execute Module 2 workflow"""
-    engine = VisibilityCheckEngine(project_id)
+def run_module2(project_id: int, run_id: int = None) -> bool:
+    """Execute Module 2 workflow; opens a new run when none is given"""
+    engine = VisibilityCheckEngine(project_id, run_id)
     return engine.run()
@@ -2,77 +2,300 @@
 Module 3: Analysis and Think Engine
 Generates insights, comparisons, and actionable recommendations
 """
+import re
 import json
+import time
+import hashlib
 import logging
-from typing import Dict, List, Any
-from django.db.models import Avg, Count, Q
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Any, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from django.conf import settings
+from django.db import connection
 from .ai_config import invoke_chatgpt
+from .context_builder import InsightsContextBuilder, compact_json, estimate_tokens
+from .report_snapshot import build_snapshot
+from .runs import current_run, finish_run
+from .db_writer import write
+from .execution_log import ExecutionLogBuffer
 from .models import (
-    VisibilityProject, VisibilityScore, BrandMention, 
-    SentimentScore, PromptResponse, DetailedReport, ExecutionLog
+    VisibilityProject, VisibilityScore, BrandMention, AIModel,
+    SentimentScore, PromptResponse, DetailedReport, ExecutionLog, Run, ResponseBlob
 )
 
 logger = logging.getLogger(__name__)
 
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+TRAILING_URL_PUNCTUATION = '.,;:!?\'"*)'
+TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref', 'ref_src'}
+SOURCE_SCAN_CHUNK_SIZE = 500
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Strip trailing punctuation, tracking params and fragments; lowercase the host"""
+    while url and url[-1] in TRAILING_URL_PUNCTUATION:
+        # Keep a closing paren that belongs to the URL, e.g. wiki/Foo_(bar)
+        if url[-1] == ')' and url.count('(') >= url.count(')'):
+            break
+        url = url[:-1]
+    
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if not parts.netloc:
+        return None
+    
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ])
+    path = '' if parts.path == '/' else parts.path
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def url_domain(url: str) -> str:
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+class MentionFact(NamedTuple):
+    """One denormalized brand mention: prompt, model, brand, position and sentiment"""
+    mention_id: int
+    response_id: int
+    prompt_id: int
+    model_id: int
+    brand: str
+    position: int
+    context: str
+    sentiment: Optional[str]
+    reasoning: Optional[str]
+
+
+def _run_section(func: Callable[[Dict[str, Any]], Any], inputs: Dict[str, Any]):
+    """Run one section in a worker thread and release its DB connection afterwards"""
+    try:
+        return func(inputs)
+    finally:
+        connection.close()
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of JSON-serializable inputs"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SectionGraph:
+    """Run report sections concurrently, each as soon as its dependencies finish"""
+    
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.nodes = {}
+        self.fingerprints = {}
+        self.reused = []
+    
+    def add(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        depends_on: Iterable[str] = (),
+        key: Optional[Callable[[], Any]] = None,
+        version: int = 1,
+        memoize: bool = True
+    ):
+        """
+        Register a section
+        
+        The section's fingerprint covers its name, version, dependency fingerprints and,
+        if given, `key()` (a cheap summary of the data it reads). Sections with
+        memoize=False are always run and fingerprinted from their result instead.
+        """
+        self.nodes[name] = (func, tuple(depends_on), key, version, memoize)
+    
+    def _fingerprint(self, name: str) -> str:
+        _, depends_on, key, version, _ = self.nodes[name]
+        return fingerprint(
+            name,
+            version,
+            key() if key else None,
+            [self.fingerprints[dep] for dep in depends_on]
+        )
+    
+    def run(
+        self,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+        memo: Optional[Dict[str, Tuple[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute every node; `on_complete(name, result)` is called on the calling thread
+        `memo` maps a section name to (fingerprint, value) from a previous run
+        
+        Returns: Dict of node name to result
+        """
+        memo = memo or {}
+        results = {}
+        pending = dict(self.nodes)
+        running = {}
+        
+        def finish(name, result):
+            results[name] = result
+            if not self.nodes[name][4]:
+                self.fingerprints[name] = fingerprint(name, self.nodes[name][3], result)
+            if on_complete:
+                on_complete(name, result)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [
+                    name for name, node in pending.items()
+                    if all(dep in results for dep in node[1])
+                ]
+                for name in ready:
+                    func, _, _, _, memoize = pending.pop(name)
+                    
+                    if memoize:
+                        self.fingerprints[name] = self._fingerprint(name)
+                        previous = memo.get(name)
+                        if previous and previous[0] == self.fingerprints[name]:
+                            self.reused.append(name)
+                            finish(name, previous[1])
+                            continue
+                    
+                    running[executor.submit(_run_section, func, dict(results))] = name
+                
+                if not running:
+                    if pending:
+                        # Reused sections may have unblocked more work
+                        if any(all(dep in results for dep in node[1]) for node in pending.values()):
+                            continue
+                        raise ValueError(f"Unresolvable section dependencies: {sorted(pending)}")
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finish(name, future.result())
+        
+        return results
+
 
 class AnalysisEngine:
     """Generate comprehensive analysis and recommendations"""
     
-    def __init__(self, project_id: int):
+    # Bump when a prompt template changes so cached LLM output is regenerated
+    INSIGHTS_PROMPT_VERSION = 2
+    ACTION_PLAN_PROMPT_VERSION = 2
+    
+    def __init__(self, project_id: int, run_id: int = None):
         self.project = VisibilityProject.objects.get(id=project_id)
         self.brand_name = self.project.company_name
+        # Module 2 opens the run; module 3 closes it
+        self.run_obj = Run.objects.get(id=run_id, project=self.project) if run_id else current_run(self.project)
+        self._facts = None
+        self._llm_fallbacks = set()  # Sections whose LLM call fell back; never memoized
+        self.log = ExecutionLogBuffer()
+    
+    def load_facts(self) -> List[MentionFact]:
+        """
+        Fetch the project's mention facts and lookups once
+        Every deterministic section is derived from these in memory
+        """
+        if self._facts is not None:
+            return self._facts
+        
+        self._facts = [
+            MentionFact(*row)
+            for row in BrandMention.objects.filter(
+                response__project=self.project
+            ).order_by('position', 'id').values_list(
+                'id', 'response_id', 'response__prompt_id', 'response__model_id', 'brand__name',
+                'position', 'context', 'sentiment__sentiment', 'sentiment__reasoning'
+            )
+        ]
+        
+        prompts = list(self.project.prompts.values_list('id', 'text', 'is_selected'))
+        self.prompt_texts = {prompt_id: text for prompt_id, text, _ in prompts}
+        self.selected_prompt_ids = [prompt_id for prompt_id, _, selected in prompts if selected]
+        
+        self.model_names = dict(AIModel.objects.values_list('id', 'display_name'))
+        self.selected_model_ids = list(
+            self.project.selected_models.filter(is_selected=True).order_by('id').values_list('model_id', flat=True)
+        )
+        
+        return self._facts
+    
+    def _positions_by_prompt(self) -> Dict[int, Dict[str, List[int]]]:
+        """Mention positions per brand for each selected prompt that has mentions"""
+        facts = self.load_facts()
+        grouped = {prompt_id: {} for prompt_id in self.selected_prompt_ids}
+        
+        for fact in facts:
+            brands = grouped.get(fact.prompt_id)
+            if brands is not None:
+                brands.setdefault(fact.brand, []).append(fact.position)
+        
+        return {prompt_id: brands for prompt_id, brands in grouped.items() if brands}
     
     def run(self):
         """Execute full analysis"""
         try:
-            ExecutionLog.objects.create(
+            self.log.add(
                 project=self.project,
                 module='module3',
                 level='info',
                 message='Starting analysis engine'
             )
             
-            # Generate all analysis sections
-            competitor_comparison = self.generate_competitor_comparison()
-            prompt_wise = self.generate_prompt_wise_analysis()
-            model_wise = self.generate_model_wise_analysis()
-            negative_sentiment = self.analyze_negative_sentiment()
-            research_sources = self.extract_research_sources()
+            started = time.monotonic()
+            stream = getattr(settings, 'MODULE3_STREAM_SECTIONS', False)
             
-            # Generate insights using ChatGPT
-            insights = self.generate_insights(
-                competitor_comparison,
-                prompt_wise,
-                model_wise,
-                negative_sentiment
-            )
+            def on_complete(name, result):
+                # Optionally persist each section as it lands so the report renders progressively
+                if stream:
+                    fields = self._report_fields(name, result)
+                    if fields:
+                        write(DetailedReport.objects.update_or_create, project=self.project, defaults=fields)
             
-            # Generate action plan
-            action_plan = self.generate_action_plan(insights)
+            graph = self.build_section_graph()
+            results = graph.run(on_complete=on_complete, memo=self._previous_sections())
+            self.log.flush()
             
             # Create or update report
-            report, created = DetailedReport.objects.update_or_create(
+            report_fields = {'section_fingerprints': self._cacheable_fingerprints(graph)}
+            for name, result in results.items():
+                report_fields.update(self._report_fields(name, result))
+            
+            report, created = write(
+                DetailedReport.objects.update_or_create,
                 project=self.project,
-                defaults={
-                    'competitor_comparison': competitor_comparison,
-                    'prompt_wise_analysis': prompt_wise,
-                    'model_wise_analysis': model_wise,
-                    'negative_sentiment_analysis': negative_sentiment,
-                    'research_sources': research_sources,
-                    'why_competitors_win': insights.get('why_competitors_win', ''),
-                    'content_gaps': insights.get('content_gaps', ''),
-                    'messaging_gaps': insights.get('messaging_gaps', ''),
-                    'positioning_weaknesses': insights.get('positioning_weaknesses', ''),
-                    'content_ideas': action_plan.get('content_ideas', []),
-                    'seo_pr_recommendations': action_plan.get('seo_pr', []),
-                    'messaging_improvements': action_plan.get('messaging', [])
+                defaults=report_fields
+            )
+            
+            self.log.add(
+                project=self.project,
+                module='module3',
+                level='info',
+                message='Report sections generated',
+                details={
+                    'elapsed_seconds': round(time.monotonic() - started, 2),
+                    'reused_sections': graph.reused
                 }
             )
             
             self.project.status = 'completed'
-            self.project.save()
+            write(self.project.save)
+            
+            if self.run_obj:
+                write(finish_run, self.run_obj)
             
-            ExecutionLog.objects.create(
+            # Pre-render the report so the first view is served from cache
+            try:
+                build_snapshot(self.project, report)
+            except Exception:
+                logger.exception("Failed to build report snapshot")
+            
+            self.log.add(
                 project=self.project,
                 module='module3',
                 level='info',
@@ -84,9 +307,12 @@ class AnalysisEngine:
         except Exception as e:
             logger.exception("Error in AnalysisEngine")
             self.project.status = 'failed'
-            self.project.save()
+            write(self.project.save)
             
-            ExecutionLog.objects.create(
+            if self.run_obj:
+                write(finish_run, self.run_obj, 'failed')
+            
+            self.log.add(
                 project=self.project,
                 module='module3',
                 level='error',
@@ -94,19 +320,183 @@ class AnalysisEngine:
             )
             
             return False
+        
+        finally:
+            self.log.close()
+    
+    def build_section_graph(self) -> SectionGraph:
+        """
+        Module 3 as a dependency graph: deterministic sections run concurrently and
+        the insights/action plan LLM calls start as soon as their inputs exist
+        """
+        graph = SectionGraph(max_workers=getattr(settings, 'MODULE3_MAX_WORKERS', 4))
+        
+        graph.add('facts', lambda r: self.load_facts(), memoize=False)
+        graph.add(
+            'competitor_comparison',
+            lambda r: self.generate_competitor_comparison(),
+            key=self._scores_key
+        )
+        graph.add(
+            'research_sources',
+            lambda r: self.extract_research_sources(),
+            ['facts'],
+            key=self._responses_key,
+            version=2
+        )
+        graph.add('prompt_wise', lambda r: self.generate_prompt_wise_analysis(), ['facts'], key=self._selection_key)
+        graph.add('model_wise', lambda r: self.generate_model_wise_analysis(), ['facts'], key=self._selection_key)
+        graph.add(
+            'negative_sentiment',
+            lambda r: self.analyze_negative_sentiment(),
+            ['facts'],
+            key=self._selection_key
+        )
+        graph.add(
+            'perspective_matrix',
+            lambda r: self.generate_perspective_matrix(r['competitor_comparison']),
+            ['facts', 'competitor_comparison'],
+            key=self._selection_key
+        )
+        graph.add(
+            'insights',
+            lambda r: self.generate_insights(
+                r['competitor_comparison'],
+                r['prompt_wise'],
+                r['model_wise'],
+                r['negative_sentiment']
+            ),
+            ['competitor_comparison', 'prompt_wise', 'model_wise', 'negative_sentiment'],
+            key=lambda: [self.brand_name, settings.INSIGHTS_TOKEN_BUDGET],
+            version=self.INSIGHTS_PROMPT_VERSION
+        )
+        graph.add(
+            'action_plan',
+            lambda r: self.generate_action_plan(r['insights']),
+            ['insights'],
+            version=self.ACTION_PLAN_PROMPT_VERSION
+        )
+        
+        return graph
+    
+    def _scores_key(self) -> List:
+        return [self.brand_name] + list(
+            VisibilityScore.objects.filter(project=self.project).order_by('id').values_list(
+                'brand__name', 'is_main_brand', 'normalized_score', 'frequency_score',
+                'prominence_score', 'sentiment_score', 'total_mentions', 'prompts_appeared_in'
+            )
+        )
+    
+    def _selection_key(self) -> List:
+        """
+        What the fact-derived sections filter and label by besides the facts themselves
+        load_facts() returns every mention of the project, so a selection change must change this key.
+        """
+        self.load_facts()
+        return [
+            self.brand_name,
+            [(prompt_id, self.prompt_texts[prompt_id]) for prompt_id in self.selected_prompt_ids],
+            [(model_id, self.model_names.get(model_id)) for model_id in self.selected_model_ids],
+        ]
+    
+    def _responses_key(self) -> List:
+        return list(
+            PromptResponse.objects.filter(
+                project=self.project,
+                status='success'
+            ).order_by('id').values_list('id', 'completed_at')
+        )
+    
+    def _previous_sections(self) -> Dict[str, Tuple[str, Any]]:
+        """(fingerprint, value) for each section stored on the existing report"""
+        report = DetailedReport.objects.filter(project=self.project).first()
+        if report is None:
+            return {}
+        
+        sections = {
+            'competitor_comparison': report.competitor_comparison,
+            'prompt_wise': report.prompt_wise_analysis,
+            'model_wise': report.model_wise_analysis,
+            'negative_sentiment': report.negative_sentiment_analysis,
+            'research_sources': {
+                'urls': report.research_sources,
+                'domains': report.source_domains
+            },
+            'perspective_matrix': report.perspective_matrix,
+            'insights': {
+                'why_competitors_win': report.why_competitors_win,
+                'content_gaps': report.content_gaps,
+                'messaging_gaps': report.messaging_gaps,
+                'positioning_weaknesses': report.positioning_weaknesses
+            },
+            'action_plan': {
+                'content_ideas': report.content_ideas,
+                'seo_pr': report.seo_pr_recommendations,
+                'messaging': report.messaging_improvements
+            }
+        }
+        
+        return {
+            name: (report.section_fingerprints[name], value)
+            for name, value in sections.items()
+            if name in report.section_fingerprints
+        }
+    
+    def _cacheable_fingerprints(self, graph: SectionGraph) -> Dict[str, str]:
+        """Fingerprints to persist, leaving out fallbacks and anything derived from them"""
+        skipped = set(self._llm_fallbacks)
+        for name, node in graph.nodes.items():
+            if any(dep in skipped for dep in node[1]):
+                skipped.add(name)
+        
+        return {
+            name: value for name, value in graph.fingerprints.items()
+            if name not in skipped and self._report_fields(name, {})
+        }
+    
+    @staticmethod
+    def _report_fields(name: str, result: Any) -> Dict[str, Any]:
+        """Map a section result onto DetailedReport fields"""
+        if name == 'insights':
+            return {
+                'why_competitors_win': result.get('why_competitors_win', ''),
+                'content_gaps': result.get('content_gaps', ''),
+                'messaging_gaps': result.get('messaging_gaps', ''),
+                'positioning_weaknesses': result.get('positioning_weaknesses', '')
+            }
+        if name == 'research_sources':
+            return {
+                'research_sources': result.get('urls', []),
+                'source_domains': result.get('domains', [])
+            }
+        if name == 'action_plan':
+            return {
+                'content_ideas': result.get('content_ideas', []),
+                'seo_pr_recommendations': result.get('seo_pr', []),
+                'messaging_improvements': result.get('messaging', [])
+            }
+        
+        field = {
+            'competitor_comparison': 'competitor_comparison',
+            'prompt_wise': 'prompt_wise_analysis',
+            'model_wise': 'model_wise_analysis',
+            'negative_sentiment': 'negative_sentiment_analysis',
+            'perspective_matrix': 'perspective_matrix'
+        }.get(name)
+        return {field: result} if field else {}
     
     def generate_competitor_comparison(self) -> Dict:
         """Generate competitor leaderboard and comparison"""
         scores = VisibilityScore.objects.filter(
             project=self.project
-        ).order_by('-normalized_score')
+        ).select_related('brand').order_by('-normalized_score')
         
         leaderboard = []
         main_brand_score = None
         
         for score in scores:
             entry = {
-                'brand': score.brand_name,
+                'brand': score.brand.name,
                 'visibility_score': round(score.normalized_score, 2),
                 'frequency': round(score.frequency_score * 100, 1),
                 'prominence': round(score.prominence_score, 3),
@@ -140,149 +530,188 @@ class AnalysisEngine:
             'gap_analysis': gap_analysis
         }
     
+    def generate_perspective_matrix(self, competitor_comparison: Dict) -> Dict:
+        """Gap analysis and prompt winners with each brand in turn as the main brand"""
+        leaderboard = competitor_comparison.get('leaderboard', [])
+        brands = [entry['brand'] for entry in leaderboard]
+        
+        # Scores don't depend on who is "main", so each gap is just a row difference
+        gaps = {}
+        for entry in leaderboard:
+            top = next((other for other in leaderboard if other['brand'] != entry['brand']), None)
+            if top is None:
+                continue
+            gaps[entry['brand']] = {
+                'top_competitor': top['brand'],
+                'score_gap': round(top['visibility_score'] - entry['visibility_score'], 2),
+                'frequency_gap': round(top['frequency'] - entry['frequency'], 1),
+                'prominence_gap': round(top['prominence'] - entry['prominence'], 3)
+            }
+        
+        prompt_positions = {
+            prompt_id: {'prompt': self.prompt_texts[prompt_id], 'positions': brand_positions}
+            for prompt_id, brand_positions in self._positions_by_prompt().items()
+        }
+        
+        prompts = []
+        summary = {brand: {'prompts_won': 0, 'prompts_present': 0} for brand in brands}
+        
+        for entry in prompt_positions.values():
+            avg_positions = {
+                brand: sum(positions) / len(positions)
+                for brand, positions in entry['positions'].items()
+            }
+            winner = min(avg_positions, key=avg_positions.get)
+            prompts.append({
+                'prompt': entry['prompt'],
+                'winner': winner,
+                'positions': {brand: round(pos, 2) for brand, pos in avg_positions.items()}
+            })
+            
+            for brand in avg_positions:
+                counts = summary.setdefault(brand, {'prompts_won': 0, 'prompts_present': 0})
+                counts['prompts_present'] += 1
+                if brand == winner:
+                    counts['prompts_won'] += 1
+        
+        return {
+            'brands': brands,
+            'gaps': gaps,
+            'prompts': prompts,
+            'summary': summary,
+            'total_prompts': len(prompts)
+        }
+    
     def generate_prompt_wise_analysis(self) -> Dict:
         """Analyze which brands win for which prompts"""
-        prompts = self.project.prompts.filter(is_selected=True)
-        
         prompt_analysis = []
         
-        for prompt in prompts:
-            # Get all mentions for this prompt across all models
-            mentions = BrandMention.objects.filter(
-                response__prompt=prompt,
-                response__project=self.project
-            ).select_related('response', 'sentiment').order_by('position')
-            
-            if not mentions.exists():
-                continue
-            
-            # Group by brand
-            brand_mentions = {}
-            for mention in mentions:
-                brand = mention.brand_name
-                if brand not in brand_mentions:
-                    brand_mentions[brand] = {
-                        'positions': [],
-                        'sentiments': [],
-                        'count': 0
-                    }
-                
-                brand_mentions[brand]['positions'].append(mention.position)
-                brand_mentions[brand]['count'] += 1
-                
-                if hasattr(mention, 'sentiment'):
-                    brand_mentions[brand]['sentiments'].append(mention.sentiment.sentiment)
-            
-            # Determine winner (lowest average position)
-            winner = None
-            winner_avg_pos = float('inf')
+        for prompt_id, brand_positions in self._positions_by_prompt().items():
+            avg_positions = {
+                brand: sum(positions) / len(positions)
+                for brand, positions in brand_positions.items()
+            }
             
-            for brand, data in brand_mentions.items():
-                avg_pos = sum(data['positions']) / len(data['positions'])
-                if avg_pos < winner_avg_pos:
-                    winner = brand
-                    winner_avg_pos = avg_pos
+            # Winner has the lowest average position
+            winner = min(avg_positions, key=avg_positions.get)
             
-            main_brand_present = self.brand_name in brand_mentions
+            main_brand_present = self.brand_name in avg_positions
             main_brand_position = None
             
             if main_brand_present:
-                main_brand_position = round(
-                    sum(brand_mentions[self.brand_name]['positions']) / 
-                    len(brand_mentions[self.brand_name]['positions']), 
-                    2
-                )
+                main_brand_position = round(avg_positions[self.brand_name], 2)
             
             prompt_analysis.append({
-                'prompt': prompt.text,
+                'prompt': self.prompt_texts[prompt_id],
                 'winner': winner,
-                'winner_avg_position': round(winner_avg_pos, 2),
+                'winner_avg_position': round(avg_positions[winner], 2),
                 'main_brand_present': main_brand_present,
                 'main_brand_position': main_brand_position,
-                'brands_mentioned': list(brand_mentions.keys())
+                'brands_mentioned': list(avg_positions.keys())
             })
         
         return {'prompts': prompt_analysis}
     
     def generate_model_wise_analysis(self) -> Dict:
         """Analyze which model favors which brand"""
-        models = self.project.selected_models.filter(is_selected=True)
+        facts = self.load_facts()
+        
+        per_model = {model_id: {} for model_id in self.selected_model_ids}
+        for fact in facts:
+            brands = per_model.get(fact.model_id)
+            if brands is not None:
+                brands.setdefault(fact.brand, []).append(fact.position)
         
         model_analysis = []
         
-        for model_selection in models:
-            model = model_selection.model
-            
-            # Get mentions for this model
-            mentions = BrandMention.objects.filter(
-                response__model=model,
-                response__project=self.project
-            ).values('brand_name').annotate(
-                count=Count('id'),
-                avg_position=Avg('position')
-            ).order_by('avg_position')
+        for model_id, brand_positions in per_model.items():
+            # (brand, count, avg_position) ordered by average position
+            ranked = sorted(
+                (
+                    (brand, len(positions), sum(positions) / len(positions))
+                    for brand, positions in brand_positions.items()
+                ),
+                key=lambda row: row[2]
+            )
             
-            top_brand = None
+            top_brand = ranked[0] if ranked else None
             main_brand_data = None
             
-            for mention_data in mentions:
-                if not top_brand:
-                    top_brand = mention_data
-                
-                if mention_data['brand_name'].lower() == self.brand_name.lower():
-                    main_brand_data = mention_data
+            for row in ranked:
+                if row[0].lower() == self.brand_name.lower():
+                    main_brand_data = row
             
             model_analysis.append({
-                'model': model.display_name,
-                'top_brand': top_brand['brand_name'] if top_brand else None,
-                'top_brand_avg_position': round(top_brand['avg_position'], 2) if top_brand else None,
-                'main_brand_avg_position': round(main_brand_data['avg_position'], 2) if main_brand_data else None,
-                'main_brand_mentions': main_brand_data['count'] if main_brand_data else 0
+                'model': self.model_names.get(model_id),
+                'top_brand': top_brand[0] if top_brand else None,
+                'top_brand_avg_position': round(top_brand[2], 2) if top_brand else None,
+                'main_brand_avg_position': round(main_brand_data[2], 2) if main_brand_data else None,
+                'main_brand_mentions': main_brand_data[1] if main_brand_data else 0
             })
         
         return {'models': model_analysis}
     
     def analyze_negative_sentiment(self) -> Dict:
         """Find and analyze negative sentiment instances"""
-        negative_sentiments = SentimentScore.objects.filter(
-            mention__response__project=self.project,
-            sentiment='negative'
-        ).select_related('mention', 'mention__response', 'mention__response__prompt', 'mention__response__model')
-        
-        negative_instances = []
-        
-        for sent in negative_sentiments:
-            negative_instances.append({
-                'brand': sent.mention.brand_name,
-                'prompt': sent.mention.response.prompt.text,
-                'model': sent.mention.response.model.display_name,
-                'context': sent.mention.context,
-                'reasoning': sent.reasoning
-            })
+        facts = self.load_facts()
+        
+        negative_instances = [
+            {
+                'brand': fact.brand,
+                'prompt': self.prompt_texts.get(fact.prompt_id),
+                'model': self.model_names.get(fact.model_id),
+                'context': fact.context,
+                'reasoning': fact.reasoning
+            }
+            for fact in sorted(facts, key=lambda fact: fact.mention_id)
+            if fact.sentiment == 'negative'
+        ]
         
         return {
             'total_negative': len(negative_instances),
             'instances': negative_instances
         }
     
-    def extract_research_sources(self) -> List[str]:
-        """Extract any URLs or sources mentioned in responses"""
+    def extract_research_sources(self) -> Dict:
+        """
+        Stream responses and collect normalized URLs with per-domain counts by model and brand
+        
+        Returns: {'urls': URLs by frequency, 'domains': [{'domain', 'count', 'models', 'brands'}, ...]}
+        """
+        brands_by_response = {}
+        for fact in self.load_facts():
+            brands_by_response.setdefault(fact.response_id, set()).add(fact.brand)
+        
+        url_counts = {}
+        domains = {}
+        
         responses = PromptResponse.objects.filter(
             project=self.project,
             status='success'
-        )
+        ).values_list('id', 'model_id', 'blob__data').iterator(chunk_size=SOURCE_SCAN_CHUNK_SIZE)
         
-        sources = []
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        
-        import re
-        
-        for response in responses:
-            urls = re.findall(url_pattern, response.raw_response)
-            sources.extend(urls)
+        for response_id, model_id, data in responses:
+            text = ResponseBlob.decompress(data)
+            for match in URL_PATTERN.finditer(text):
+                url = normalize_url(match.group(0))
+                if url is None:
+                    continue
+                url_counts[url] = url_counts.get(url, 0) + 1
+                
+                entry = domains.setdefault(url_domain(url), {'count': 0, 'models': {}, 'brands': {}})
+                entry['count'] += 1
+                model = self.model_names.get(model_id, str(model_id))
+                entry['models'][model] = entry['models'].get(model, 0) + 1
+                for brand in brands_by_response.get(response_id, ()):
+                    entry['brands'][brand] = entry['brands'].get(brand, 0) + 1
         
-        # Return unique sources
-        return list(set(sources))
+        return {
+            'urls': sorted(url_counts, key=lambda url: (-url_counts[url], url)),
+            'domains': [
+                {'domain': domain, **entry}
+                for domain, entry in sorted(domains.items(), key=lambda pair: (-pair[1]['count'], pair[0]))
+            ]
+        }
     
     def generate_insights(
         self, 
@@ -293,27 +722,14 @@ class AnalysisEngine:
     ) -> Dict:
         """Use Gemini to generate strategic insights"""
         
-        # Prepare data summary
-        data_summary = f"""
-VISIBILITY ANALYSIS DATA:
-
-Main Brand: {self.brand_name}
-
-LEADERBOARD:
-{json.dumps(competitor_comparison.get('leaderboard', []), indent=2)}
-
-GAP ANALYSIS:
-{json.dumps(competitor_comparison.get('gap_analysis', {}), indent=2)}
-
-PROMPT-WISE WINNERS:
-{json.dumps(prompt_wise.get('prompts', [])[:5], indent=2)}
-
-MODEL-WISE PERFORMANCE:
-{json.dumps(model_wise.get('models', []), indent=2)}
-
-NEGATIVE SENTIMENT:
-{json.dumps(negative_sentiment, indent=2)}
-"""
+        # Prepare data summary within the token budget
+        data_summary, data_tokens = InsightsContextBuilder(self.brand_name).build(
+            competitor_comparison,
+            prompt_wise,
+            model_wise,
+            negative_sentiment
+        )
+        data_summary = f"VISIBILITY ANALYSIS DATA:\n{data_summary}"
         
         prompt = f"""You are a strategic brand consultant. Analyze this AI visibility data and provide insights:
 
@@ -347,6 +763,7 @@ Return as JSON:
 }}
 """
         
+        self._log_prompt_size('insights', prompt, data_tokens)
         success, response, error = invoke_chatgpt(prompt)
         
         if success:
@@ -357,6 +774,7 @@ Return as JSON:
                 logger.warning("Failed to parse insights JSON")
         
         # Fallback
+        self._llm_fallbacks.add('insights')
         return {
             'why_competitors_win': 'Analysis pending',
             'content_gaps': 'Analysis pending',
@@ -364,12 +782,26 @@ Return as JSON:
             'positioning_weaknesses': 'Analysis pending'
         }
     
+    def _log_prompt_size(self, call: str, prompt: str, data_tokens: int = None):
+        """Record the estimated tokens sent for one LLM call"""
+        details = {'call': call, 'prompt_tokens': estimate_tokens(prompt)}
+        if data_tokens is not None:
+            details['data_tokens'] = data_tokens
+        
+        self.log.add(
+            project=self.project,
+            module='module3',
+            level='info',
+            message=f"Sending {call} prompt (~{details['prompt_tokens']} tokens)",
+            details=details
+        )
+    
     def generate_action_plan(self, insights: Dict) -> Dict:
         """Generate actionable recommendations"""
         
         prompt = f"""Based on these insights about {self.brand_name}'s AI visibility:
 
-{json.dumps(insights, indent=2)}
+{compact_json(insights)}
 
 Generate a concrete ACTION PLAN with:
 
@@ -397,6 +829,7 @@ Return as JSON:
 }}
 """
         
+        self._log_prompt_size('action_plan', prompt)
         success, response, error = invoke_chatgpt(prompt)
         
         if success:
@@ -407,6 +840,7 @@ Return as JSON:
                 logger.warning("Failed to parse action plan JSON")
         
         # Fallback
+        self._llm_fallbacks.add('action_plan')
         return {
             'content_ideas': [],
             'seo_pr': [],
@@ -414,7 +848,7 @@ Return as JSON:
         }
 
 
-def run_module3(project_id: int) -> bool:
-    """Execute Module 3 workflow"""
-    engine = AnalysisEngine(project_id)
+def run_module3(project_id: int, run_id: int = None) -> bool:
+    """Execute Module 3 workflow; closes the given run, or the project's open one"""
+    engine = AnalysisEngine(project_id, run_id)
     return engine.run()
@@ -0,0 +1,111 @@
+"""
+Near-duplicate prompt detection
+MinHash signatures over character shingles with LSH banding
+"""
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+from django.conf import settings
+
+from .response_store import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _hash(value: str, seed: int = 0) -> int:
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8, salt=seed.to_bytes(8, 'little'))
+    return int.from_bytes(digest.digest(), 'little')
+
+
+# Fixed (a, b) pairs so signatures are stable across processes
+_PERMUTATIONS = [
+    (_hash('a', seed) % (_MERSENNE_PRIME - 1) + 1, _hash('b', seed) % _MERSENNE_PRIME)
+    for seed in range(NUM_PERMUTATIONS)
+]
+
+
+def shingles(text: str) -> Set[str]:
+    """Character shingles of the normalized prompt"""
+    normalized = normalize_prompt(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingle_set: Set[str]) -> Tuple[int, ...]:
+    hashes = [_hash(shingle) & _MAX_HASH for shingle in shingle_set]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(left: Set[str], right: Set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def find_near_duplicates(prompts: Iterable[Tuple[int, str]], threshold: float = None) -> List[List[int]]:
+    """
+    Group near-duplicate prompts
+    
+    Returns: List of id groups, each ordered as given, with the first id as the keeper
+    """
+    if threshold is None:
+        threshold = settings.PROMPT_DEDUP_THRESHOLD
+    
+    prompts = list(prompts)
+    order = {prompt_id: index for index, (prompt_id, _) in enumerate(prompts)}
+    shingle_sets = {prompt_id: shingles(text) for prompt_id, text in prompts}
+    
+    # LSH: prompts sharing any band of their signature become candidates
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    for prompt_id, shingle_set in shingle_sets.items():
+        signature = minhash_signature(shingle_set)
+        for band in range(BANDS):
+            chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            buckets.setdefault((band, chunk), []).append(prompt_id)
+    
+    parent = {prompt_id: prompt_id for prompt_id in shingle_sets}
+    
+    def find(prompt_id):
+        while parent[prompt_id] != prompt_id:
+            parent[prompt_id] = parent[parent[prompt_id]]
+            prompt_id = parent[prompt_id]
+        return prompt_id
+    
+    checked = set()
+    for members in buckets.values():
+        for i, left in enumerate(members):
+            for right in members[i + 1:]:
+                pair = (left, right)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                # Verify candidates with the exact similarity
+                if jaccard(shingle_sets[left], shingle_sets[right]) >= threshold:
+                    root_left, root_right = find(left), find(right)
+                    if root_left != root_right:
+                        parent[max(root_left, root_right, key=order.get)] = min(
+                            root_left, root_right, key=order.get
+                        )
+    
+    groups: Dict[int, List[int]] = {}
+    for prompt_id, _ in prompts:
+        groups.setdefault(find(prompt_id), []).append(prompt_id)
+    
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def estimate_saved_calls(groups: List[List[int]], model_count: int) -> int:
+    """LLM calls avoided by querying only the first prompt of each group"""
+    return sum(len(group) - 1 for group in groups) * model_count
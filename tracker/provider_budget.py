@@ -0,0 +1,60 @@
+"""
+Per-provider daily call budget
+Counts model queries per provider and day and refuses calls once the configured budget is spent
+"""
+from typing import Dict, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ProviderUsage
+
+
+def daily_budget(provider: str) -> Optional[int]:
+    """Configured calls per day for a provider, or None when unlimited"""
+    return getattr(settings, 'PROVIDER_DAILY_CALL_BUDGET', {}).get(provider)
+
+
+def calls_today(provider: str) -> int:
+    return ProviderUsage.objects.filter(
+        provider=provider, day=timezone.localdate()
+    ).values_list('calls', flat=True).first() or 0
+
+
+def remaining_calls(provider: str) -> Optional[int]:
+    """Calls left today, or None when unlimited"""
+    budget = daily_budget(provider)
+    if budget is None:
+        return None
+    return max(budget - calls_today(provider), 0)
+
+
+def try_consume_call(provider: str) -> bool:
+    """Count one call against today's budget; False (and nothing counted) if it is spent"""
+    budget = daily_budget(provider)
+
+    with transaction.atomic():
+        usage, _ = ProviderUsage.objects.select_for_update().get_or_create(
+            provider=provider,
+            day=timezone.localdate()
+        )
+        if budget is not None and usage.calls >= budget:
+            return False
+
+        usage.calls += 1
+        usage.save(update_fields=['calls'])
+
+    return True
+
+
+def fits_budget(estimated_calls: Dict[str, int]) -> Optional[str]:
+    """
+    Check an estimated number of calls per provider against what is left today
+
+    Returns: None if it fits, otherwise the first provider that would run out
+    """
+    for provider, needed in estimated_calls.items():
+        left = remaining_calls(provider)
+        if left is not None and needed > left:
+            return provider
+    return None
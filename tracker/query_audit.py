@@ -0,0 +1,232 @@
+"""
+Query plan audit
+Seeds a synthetic dataset, EXPLAINs the engines' hot queries against it and flags full table scans
+"""
+import re
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .models import (
+    VisibilityProject, Competitor, AIModel, Prompt, ModelSelection, PromptResponse,
+    TrackedBrand, BrandMention, SentimentScore, VisibilityScore, ExecutionLog,
+    Run, RunResponse, MonitoringSchedule
+)
+
+# Plan lines that read a whole table: SQLite "SCAN <table>" without an index, PostgreSQL "Seq Scan on <table>"
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?!CONSTANT ROW)(?P<table>\w+)(?! USING)(?:\s|$)'),
+    re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+]
+
+# Sorts done outside an index; reported but not treated as a problem
+SORT_PATTERN = re.compile(r'USE TEMP B-TREE FOR ORDER BY|\bSort\b')
+
+
+class AuditResult(NamedTuple):
+    name: str
+    full_scans: List[str]
+    sorts: bool
+    plan: str
+
+
+def _batched(model, objects, batch_size=2000):
+    return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def seed_dataset(projects: int = 40, prompts: int = 25, runs: int = 3) -> Dict:
+    """
+    Bulk-insert a synthetic monitoring dataset; call inside a transaction that is rolled back
+
+    Returns: sample objects used to parameterize the audited queries
+    """
+    user = User.objects.create(username=f'query-audit-{timezone.now().timestamp()}')
+    models = [
+        AIModel.objects.get_or_create(name=name, defaults={'display_name': display, 'weight': weight})[0]
+        for name, display, weight in [('chatgpt', 'ChatGPT', 1.0), ('claude', 'Claude', 0.9), ('gemini', 'Gemini', 0.8)]
+    ]
+    now = timezone.now()
+
+    project_objs = _batched(VisibilityProject, [
+        VisibilityProject(
+            user=user,
+            name=f'Audit {i}',
+            company_name=f'Brand{i}',
+            company_description='Synthetic project',
+            area_of_work='Synthetic',
+            status='completed'
+        )
+        for i in range(projects)
+    ])
+
+    competitors = _batched(Competitor, [
+        Competitor(project=project, name=f'Rival{i}-{j}', is_validated=True)
+        for i, project in enumerate(project_objs) for j in range(2)
+    ])
+    competitors_by_project = {}
+    for competitor in competitors:
+        competitors_by_project.setdefault(competitor.project_id, []).append(competitor)
+
+    brands = _batched(TrackedBrand, [
+        TrackedBrand(project=project, name=project.company_name, key=project.company_name.lower(), is_main_brand=True)
+        for project in project_objs
+    ] + [
+        TrackedBrand(project_id=c.project_id, name=c.name, key=c.name.lower(), competitor=c)
+        for c in competitors
+    ])
+    brands_by_project = {}
+    for brand in brands:
+        brands_by_project.setdefault(brand.project_id, []).append(brand)
+
+    _batched(ModelSelection, [
+        ModelSelection(project=project, model=model) for project in project_objs for model in models
+    ])
+
+    prompt_objs = _batched(Prompt, [
+        Prompt(project=project, text=f'Question {j} about {project.area_of_work}', is_selected=j % 5 != 0)
+        for project in project_objs for j in range(prompts)
+    ])
+
+    run_objs = _batched(Run, [
+        Run(project=project, number=n + 1, status='completed' if n < runs - 1 else 'running')
+        for project in project_objs for n in range(runs)
+    ])
+    runs_by_project = {}
+    for run in run_objs:
+        runs_by_project.setdefault(run.project_id, []).append(run)
+    latest_run = {project_id: project_runs[-1] for project_id, project_runs in runs_by_project.items()}
+
+    responses = _batched(PromptResponse, [
+        PromptResponse(
+            project_id=prompt.project_id,
+            prompt=prompt,
+            model=model,
+            status='success' if (prompt.id + model.id) % 7 else 'failed',
+            prompt_key=f'{prompt.id:064d}',
+            completed_at=now - timedelta(hours=prompt.id % 48),
+            run=latest_run[prompt.project_id],
+            content_hash=f'{prompt.id:064d}'
+        )
+        for prompt in prompt_objs for model in models
+    ])
+
+    mentions = _batched(BrandMention, [
+        BrandMention(
+            response=response,
+            brand=brand,
+            position=position,
+            context='synthetic context'
+        )
+        for response in responses if response.status == 'success'
+        for position, brand in enumerate(brands_by_project[response.project_id], start=1)
+    ])
+
+    sentiments = ['very_positive', 'positive', 'neutral', 'negative']
+    _batched(SentimentScore, [
+        SentimentScore(mention=mention, sentiment=sentiments[mention.id % 4]) for mention in mentions
+    ])
+
+    _batched(VisibilityScore, [
+        VisibilityScore(project_id=brand.project_id, brand=brand, normalized_score=brand.id % 100)
+        for brand in brands
+    ])
+
+    _batched(RunResponse, [
+        RunResponse(run=run, response=response, content_hash=response.content_hash)
+        for response in responses for run in runs_by_project[response.project_id]
+    ])
+
+    _batched(ExecutionLog, [
+        ExecutionLog(project=project, module='module2', message=f'Synthetic log {n}')
+        for project in project_objs for n in range(20)
+    ])
+
+    _batched(MonitoringSchedule, [
+        MonitoringSchedule(project=project, next_run_at=now + timedelta(minutes=i))
+        for i, project in enumerate(project_objs)
+    ])
+
+    if connection.vendor == 'sqlite':
+        # Give the planner row statistics for the synthetic tables
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    project = project_objs[len(project_objs) // 2]
+    response = next(r for r in responses if r.project_id == project.id and r.status == 'success')
+    return {
+        'project': project,
+        'brand': brands_by_project[project.id][0],
+        'model': models[0],
+        'response': response,
+        'run': latest_run[project.id],
+        'now': now,
+    }
+
+
+# Name (module.function) -> queryset built from the seeded sample
+HOT_QUERIES: Dict[str, Callable[[Dict], object]] = {
+    'module2.extract_mentions': lambda s: PromptResponse.objects.filter(project=s['project'], status='success'),
+    'module2.analyze_sentiment': lambda s: BrandMention.objects.filter(
+        response__project=s['project']
+    ).select_related('response', 'response__prompt', 'brand'),
+    'module2.calculate_brand_score': lambda s: BrandMention.objects.filter(
+        response__project=s['project'], brand=s['brand']
+    ).select_related('response', 'response__model', 'sentiment'),
+    'module2.selected_prompts': lambda s: Prompt.objects.filter(project=s['project'], is_selected=True),
+    'module3.load_facts': lambda s: BrandMention.objects.filter(
+        response__project=s['project']
+    ).order_by('position', 'id').values_list(
+        'id', 'response_id', 'response__prompt_id', 'response__model_id', 'brand__name',
+        'position', 'context', 'sentiment__sentiment', 'sentiment__reasoning'
+    ),
+    'module3.negative_sentiment': lambda s: SentimentScore.objects.filter(
+        sentiment='negative', mention__response__project=s['project']
+    ),
+    'module3.responses_key': lambda s: PromptResponse.objects.filter(
+        project=s['project'], status='success'
+    ).order_by('id').values_list('id', 'completed_at'),
+    'views.report_scores': lambda s: VisibilityScore.objects.filter(
+        project=s['project']
+    ).select_related('brand').order_by('-normalized_score'),
+    'views.execution_logs': lambda s: ExecutionLog.objects.filter(project=s['project']).order_by('timestamp'),
+    'response_store.lookup': lambda s: PromptResponse.objects.filter(
+        prompt_key=s['response'].prompt_key,
+        model=s['model'],
+        temperature=0.7,
+        status='success',
+        completed_at__gte=s['now'] - timedelta(hours=24)
+    ).order_by('-completed_at')[:1],
+    'runs.current_run': lambda s: Run.objects.filter(project=s['project'], status='running').order_by('-number')[:1],
+    'runs.previous_version': lambda s: RunResponse.objects.filter(
+        response=s['response'], run__number__lt=s['run'].number
+    ).order_by('-run__number').values('id')[:1],
+    'runs.mention_rankings': lambda s: BrandMention.objects.filter(
+        response_id__in=[s['response'].id]
+    ).order_by('response_id', 'position').values_list('response_id', 'brand__name', 'position', 'sentiment__sentiment'),
+    'scheduler.due_schedules': lambda s: MonitoringSchedule.objects.filter(
+        is_active=True, next_run_at__lte=s['now']
+    ).order_by('next_run_at'),
+}
+
+
+def full_scans(plan: str) -> List[str]:
+    """Tables read in full according to an EXPLAIN output"""
+    tables = []
+    for line in plan.splitlines():
+        for pattern in FULL_SCAN_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                tables.append(match.group('table'))
+    return tables
+
+
+def audit_queries(sample: Dict, names: Optional[List[str]] = None) -> List[AuditResult]:
+    results = []
+    for name, build in HOT_QUERIES.items():
+        if names and name not in names:
+            continue
+        plan = build(sample).explain()
+        results.append(AuditResult(name, full_scans(plan), bool(SORT_PATTERN.search(plan)), plan))
+    return results
@@ -0,0 +1,80 @@
+"""
+Adaptive refresh policy
+Tracks how much each prompt x model ranking moves between runs and spends a
+per-run call budget on the answers most likely to have changed
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PromptResponse
+
+
+def ranking_change(previous: List[List], current: List[List]) -> float:
+    """
+    Normalized footrule distance between two mention rankings ([[brand, position, ...], ...])
+
+    Returns: 0.0 for an identical order, 1.0 for a fully different one
+    """
+    before = {entry[0].lower(): entry[1] for entry in previous}
+    after = {entry[0].lower(): entry[1] for entry in current}
+    brands = set(before) | set(after)
+    if not brands:
+        return 0.0
+
+    # A brand that is missing on one side ranks just below the last position
+    missing = len(brands) + 1
+    distance = sum(abs(before.get(brand, missing) - after.get(brand, missing)) for brand in brands)
+    # Largest footrule of a permutation is floor(n^2 / 2), reached by a full reversal
+    worst = max(len(brands) * len(brands) // 2, 1)
+    return min(distance / worst, 1.0)
+
+
+def update_volatility(volatility: float, change: float, alpha: Optional[float] = None) -> float:
+    """Exponentially weighted moving average of ranking change"""
+    if alpha is None:
+        alpha = settings.REFRESH_VOLATILITY_ALPHA
+    return alpha * change + (1 - alpha) * volatility
+
+
+def refresh_priority(volatility: float, completed_at: Optional[datetime], now: datetime) -> float:
+    """Volatile answers first; stable ones rise as they age towards REFRESH_MAX_AGE_HOURS"""
+    if completed_at is None:
+        return float('inf')
+    age_hours = (now - completed_at).total_seconds() / 3600
+    return volatility + age_hours / settings.REFRESH_MAX_AGE_HOURS
+
+
+def select_due_pairs(
+    project_id: int,
+    pairs: Iterable[Tuple[int, int]],
+    budget: int,
+    now: Optional[datetime] = None
+) -> Set[Tuple[int, int]]:
+    """
+    Choose which (prompt id, model id) pairs to query this run within `budget` calls
+
+    Pairs without a successful answer come first, then answers past REFRESH_MAX_AGE_HOURS,
+    then the highest refresh priority.
+    """
+    now = now or timezone.now()
+    pairs = list(pairs)
+    if budget >= len(pairs):
+        return set(pairs)
+
+    known = {
+        (prompt_id, model_id): (status, volatility, completed_at)
+        for prompt_id, model_id, status, volatility, completed_at in PromptResponse.objects.filter(
+            project_id=project_id
+        ).values_list('prompt_id', 'model_id', 'status', 'volatility', 'completed_at')
+    }
+
+    def rank(pair):
+        status, volatility, completed_at = known.get(pair, (None, 1.0, None))
+        if status != 'success':
+            return (0, 0.0)
+        overdue = completed_at is None or (now - completed_at).total_seconds() >= settings.REFRESH_MAX_AGE_HOURS * 3600
+        return (1 if overdue else 2, -refresh_priority(volatility, completed_at, now))
+
+    return set(sorted(pairs, key=rank)[:max(budget, 0)])
@@ -0,0 +1,112 @@
+"""
+Report sections API
+Cursor-paginated access to individual DetailedReport sections so pages can load them on demand
+"""
+import base64
+import binascii
+import json
+from typing import Dict, Optional
+
+from .models import DetailedReport
+from .report_snapshot import snapshot_etag
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Section name -> (report field, key holding the list inside the field or None, paginated)
+REPORT_SECTIONS = {
+    'leaderboard': ('competitor_comparison', 'leaderboard', True),
+    'prompts': ('prompt_wise_analysis', 'prompts', True),
+    'models': ('model_wise_analysis', 'models', True),
+    'negative': ('negative_sentiment_analysis', 'instances', True),
+    'domains': ('source_domains', None, True),
+    'sources': ('research_sources', None, True),
+    'perspective': ('perspective_matrix', None, False),
+}
+
+# Large JSON fields not needed for the first paint of the report page
+HEAVY_REPORT_FIELDS = (
+    'prompt_wise_analysis',
+    'negative_sentiment_analysis',
+    'research_sources',
+    'source_domains',
+    'perspective_matrix',
+    'section_fingerprints',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class StaleCursor(Exception):
+    """The report changed since the cursor was issued"""
+    pass
+
+
+def encode_cursor(offset: int, version: str) -> str:
+    raw = json.dumps({'o': offset, 'v': version}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = int(data['o'])
+        version = str(data['v'])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Malformed cursor')
+
+    if offset < 0:
+        raise InvalidCursor('Malformed cursor')
+    return {'offset': offset, 'version': version}
+
+
+def parse_limit(value: Optional[str]) -> int:
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidCursor('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def section_page(project_id: int, section: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Optional[Dict]:
+    """
+    One page of a report section, loading only that section's column
+
+    Returns: None if the project has no report; raises KeyError for unknown sections
+    """
+    field, key, paginated = REPORT_SECTIONS[section]
+
+    row = DetailedReport.objects.filter(project_id=project_id).values_list('id', 'updated_at', field).first()
+    if row is None:
+        return None
+
+    report_id, updated_at, data = row
+    version = snapshot_etag(report_id, updated_at)
+
+    if not paginated:
+        return {'section': section, 'data': data, 'version': version}
+
+    items = (data or {}).get(key, []) if key else (data or [])
+
+    offset = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        if position['version'] != version:
+            raise StaleCursor(section)
+        offset = position['offset']
+
+    page = items[offset:offset + limit]
+    end = offset + len(page)
+
+    return {
+        'section': section,
+        'items': page,
+        'total': len(items),
+        'next_cursor': encode_cursor(end, version) if end < len(items) else None,
+        'version': version
+    }
@@ -0,0 +1,110 @@
+"""
+Pre-rendered report snapshots
+HTML fragment and compact JSON for a completed report, kept in the Django cache
+"""
+import hashlib
+import logging
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+
+from .db_routing import reading_replica
+from .models import VisibilityProject, VisibilityScore, DetailedReport
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_cache_key(project_id: int) -> str:
+    return f"report_snapshot:{project_id}"
+
+
+def snapshot_etag(report_id: int, updated_at, scores_updated_at=None, score_count: int = 0) -> str:
+    scores = f"{scores_updated_at.isoformat() if scores_updated_at else ''}:{score_count}"
+    return hashlib.sha256(f"{report_id}:{updated_at.isoformat()}:{scores}".encode('utf-8')).hexdigest()[:32]
+
+
+def report_version(reports) -> Optional[Tuple]:
+    """
+    (report id, updated_at, latest score update, score count) of the first report in `reports`
+    Rescoring changes the rendered report without touching the DetailedReport row.
+    """
+    return reports.annotate(
+        scores_updated_at=Max('project__visibility_scores__updated_at'),
+        score_count=Count('project__visibility_scores')
+    ).values_list('id', 'updated_at', 'scores_updated_at', 'score_count').first()
+
+
+def version_last_modified(version: Tuple):
+    return max(moment for moment in version[1:3] if moment)
+
+
+def build_snapshot(project: VisibilityProject, report: Optional[DetailedReport] = None) -> Dict:
+    """
+    Render the report body and payload once and store them in the cache
+    Snapshots built from the replica are not stored: it may lag, and the cache is shared with primary readers.
+    """
+    if report is None:
+        report = DetailedReport.objects.get(project=project)
+    
+    scores = list(
+        VisibilityScore.objects.filter(project=project).select_related('brand', 'competitor').order_by('-normalized_score')
+    )
+    
+    html = render_to_string('tracker/partials/report_body.html', {
+        'project': project,
+        'report': report,
+        'scores': scores
+    })
+    
+    payload = {
+        'project': {
+            'id': project.id,
+            'company_name': project.company_name,
+            'status': project.status
+        },
+        'leaderboard': report.competitor_comparison.get('leaderboard', []),
+        'gap_analysis': report.competitor_comparison.get('gap_analysis', {}),
+        'models': report.model_wise_analysis.get('models', []),
+        'total_negative': report.negative_sentiment_analysis.get('total_negative', 0),
+        'insights': {
+            'why_competitors_win': report.why_competitors_win,
+            'content_gaps': report.content_gaps,
+            'messaging_gaps': report.messaging_gaps,
+            'positioning_weaknesses': report.positioning_weaknesses
+        },
+        'generated_at': report.updated_at.isoformat()
+    }
+    
+    version = (report.id, report.updated_at, max((score.updated_at for score in scores), default=None), len(scores))
+    snapshot = {
+        'etag': snapshot_etag(*version),
+        'last_modified': version_last_modified(version),
+        'html': html,
+        'payload': payload
+    }
+    if not reading_replica():
+        cache.set(snapshot_cache_key(project.id), snapshot, timeout=settings.REPORT_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def get_snapshot(project: VisibilityProject) -> Optional[Dict]:
+    """
+    Cached snapshot for a completed project, rebuilt if missing or stale
+    
+    Returns: None if the project has no report
+    """
+    current = report_version(DetailedReport.objects.filter(project=project))
+    if current is None:
+        return None
+    
+    snapshot = cache.get(snapshot_cache_key(project.id))
+    if snapshot and snapshot['etag'] == snapshot_etag(*current):
+        return snapshot
+    
+    return build_snapshot(project)
+
+
+def invalidate_snapshot(project_id: int) -> None:
+    cache.delete(snapshot_cache_key(project_id))
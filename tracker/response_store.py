@@ -0,0 +1,115 @@
+"""
+Cross-project shared response store
+Reuses a fresh answer to the same question asked by another project
+"""
+import re
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Optional, Tuple
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AIModel, PromptResponse
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = _PUNCTUATION.sub(' ', text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def prompt_key(text: str) -> str:
+    """Stable lookup key for a prompt's normalized text"""
+    return hashlib.sha256(normalize_prompt(text).encode('utf-8')).hexdigest()
+
+
+class _InFlight:
+    """A model call that other callers can wait on"""
+    
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.done = threading.Event()
+        self.result = (False, "", "Coalesced request did not complete")
+
+
+class SharedResponseStore:
+    """Lookup of fresh responses plus coalescing of identical in-flight calls"""
+    
+    _lock = threading.Lock()
+    _in_flight = {}
+    
+    def __init__(self, max_age_hours: Optional[int] = None):
+        if max_age_hours is None:
+            max_age_hours = settings.SHARED_RESPONSE_MAX_AGE_HOURS
+        self.max_age = timedelta(hours=max_age_hours)
+    
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, 'SHARED_RESPONSE_STORE_ENABLED', False)
+    
+    def lookup(
+        self,
+        key: str,
+        model: AIModel,
+        temperature: float,
+        project_id: Optional[int] = None
+    ) -> Optional[PromptResponse]:
+        """
+        Most recent successful response for (prompt, model, temperature) within the window
+        
+        Answers of `project_id` itself, and other projects' copies of them, are skipped: reusing
+        those would hand the project its own old answer instead of a fresh one.
+        """
+        candidates = PromptResponse.objects.filter(
+            prompt_key=key,
+            model=model,
+            temperature=temperature,
+            status='success',
+            completed_at__gte=timezone.now() - self.max_age
+        )
+        if project_id is not None:
+            candidates = candidates.exclude(project_id=project_id).exclude(source_response__project_id=project_id)
+        
+        return candidates.order_by('-completed_at').first()
+    
+    def coalesce(
+        self,
+        key: str,
+        model_name: str,
+        temperature: float,
+        project_id: int,
+        call: Callable[[], Tuple[bool, str, str]]
+    ) -> Tuple[Tuple[bool, str, str], Optional[int]]:
+        """
+        Run `call` once for concurrent identical requests
+        
+        Returns: (result of call, project id of the leader if this caller waited on it)
+        """
+        flight_key = (key, model_name, temperature)
+        
+        with self._lock:
+            flight = self._in_flight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight(project_id)
+                self._in_flight[flight_key] = flight
+        
+        if not leader:
+            flight.done.wait()
+            return flight.result, flight.project_id
+        
+        try:
+            flight.result = call()
+        finally:
+            with self._lock:
+                self._in_flight.pop(flight_key, None)
+            flight.done.set()
+        
+        return flight.result, None
@@ -0,0 +1,259 @@
+"""
+Retention
+Compacts old execution logs into per-run summaries and archives the raw data of inactive completed
+projects into compressed per-project files that can be restored on demand
+"""
+import gzip
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import (
+    VisibilityProject, PromptResponse, BrandMention, SentimentScore, ExecutionLog,
+    Run, RunResponse, ResponseBlob, MonitoringSchedule
+)
+from .search import unindex_blobs
+
+logger = logging.getLogger(__name__)
+
+# Warnings and errors kept verbatim in a run's log summary
+MAX_SUMMARY_PROBLEMS = 20
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _summarize(logs) -> Dict:
+    """Counts and notable entries of a set of ExecutionLog rows, computed in the database"""
+    bounds = logs.aggregate(entries=Count('id'), first_at=Min('timestamp'), last_at=Max('timestamp'))
+    problems = logs.filter(level__in=['warning', 'error']).order_by('timestamp').values_list(
+        'timestamp', 'level', 'module', 'message'
+    )[:MAX_SUMMARY_PROBLEMS]
+
+    return {
+        'entries': bounds['entries'],
+        'first_at': bounds['first_at'].isoformat(),
+        'last_at': bounds['last_at'].isoformat(),
+        'levels': dict(logs.order_by().values_list('level').annotate(Count('id'))),
+        'modules': dict(logs.order_by().values_list('module').annotate(Count('id'))),
+        'problems': [
+            {'at': at.isoformat(), 'level': level, 'module': module, 'message': message[:500]}
+            for at, level, module, message in problems
+        ],
+    }
+
+
+def _merge(summary: Dict, addition: Dict) -> Dict:
+    """Fold a later compaction into an existing summary"""
+    if not summary:
+        return addition
+
+    def add_counts(a, b):
+        return {key: a.get(key, 0) + b.get(key, 0) for key in {*a, *b}}
+
+    return {
+        'entries': summary['entries'] + addition['entries'],
+        'first_at': min(summary['first_at'], addition['first_at']),
+        'last_at': max(summary['last_at'], addition['last_at']),
+        'levels': add_counts(summary['levels'], addition['levels']),
+        'modules': add_counts(summary['modules'], addition['modules']),
+        'problems': (summary['problems'] + addition['problems'])[:MAX_SUMMARY_PROBLEMS],
+    }
+
+
+def compact_logs(days: Optional[int] = None, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Replace execution logs older than `days` with a summary on the run they belong to
+
+    A run owns the logs from its start until the next run starts. Info entries from before a
+    project's first run (module 1) are dropped; their warnings and errors are kept.
+    """
+    days = settings.LOG_RETENTION_DAYS if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    stats = {'runs': 0, 'compacted': 0, 'dropped': 0}
+
+    project_ids = ExecutionLog.objects.filter(timestamp__lt=cutoff).values_list('project_id', flat=True).distinct()
+    for project_id in list(project_ids):
+        runs = list(Run.objects.filter(project_id=project_id, started_at__lt=cutoff).order_by('started_at'))
+
+        for index, run in enumerate(runs):
+            if run.status == 'running':
+                continue
+            end = runs[index + 1].started_at if index + 1 < len(runs) else cutoff
+            logs = ExecutionLog.objects.filter(
+                project_id=project_id, timestamp__gte=run.started_at, timestamp__lt=min(end, cutoff)
+            )
+            if not logs.exists():
+                continue
+
+            stats['runs'] += 1
+            if dry_run:
+                stats['compacted'] += logs.count()
+                continue
+
+            with transaction.atomic():
+                run.log_summary = _merge(run.log_summary, _summarize(logs))
+                run.save(update_fields=['log_summary'])
+                stats['compacted'] += logs.delete()[1].get('tracker.ExecutionLog', 0)
+
+        before_runs = ExecutionLog.objects.filter(
+            project_id=project_id,
+            level='info',
+            timestamp__lt=min([cutoff] + [run.started_at for run in runs[:1]])
+        )
+        if dry_run:
+            stats['dropped'] += before_runs.count()
+        else:
+            stats['dropped'] += before_runs.delete()[1].get('tracker.ExecutionLog', 0)
+
+    return stats
+
+
+def archive_path(project_id: int) -> Path:
+    return Path(settings.ARCHIVE_DIR) / f'project-{project_id}.jsonl.gz'
+
+
+def _archived_querysets(project_id: int) -> List:
+    """Raw data moved out of the live tables, in restore order"""
+    responses = PromptResponse.objects.filter(project_id=project_id)
+    versions = RunResponse.objects.filter(response__project_id=project_id)
+    blob_ids = set(responses.exclude(blob=None).values_list('blob_id', flat=True))
+    blob_ids.update(versions.exclude(blob=None).values_list('blob_id', flat=True))
+
+    return [
+        ResponseBlob.objects.filter(id__in=blob_ids),
+        responses,
+        BrandMention.objects.filter(response__project_id=project_id),
+        SentimentScore.objects.filter(mention__response__project_id=project_id),
+        versions,
+        ExecutionLog.objects.filter(project_id=project_id),
+    ]
+
+
+def live_impersonations():
+    return VisibilityProject.objects.filter(source_project__isnull=False, archived_at__isnull=True)
+
+
+def live_shared_copies():
+    """Responses of live projects that reuse another project's answer from the shared store"""
+    return PromptResponse.objects.filter(source_response__isnull=False, project__archived_at__isnull=True).exclude(
+        project_id=F('source_response__project_id')
+    )
+
+
+def archivable_projects(days: Optional[int] = None, now: Optional[datetime] = None):
+    """
+    Completed, unscheduled projects with no run in the last `days` days
+
+    Sources of live impersonation projects stay, as do projects whose answers live projects reuse from the
+    shared store: the delete would null those links for good.
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    scheduled = MonitoringSchedule.objects.filter(is_active=True).values('project_id')
+    impersonated = live_impersonations().values('source_project_id')
+    shared = live_shared_copies().values('source_response__project_id')
+
+    return (
+        VisibilityProject.objects.filter(status='completed', archived_at__isnull=True, updated_at__lt=cutoff)
+        .exclude(id__in=scheduled)
+        .exclude(id__in=impersonated)
+        .exclude(id__in=shared)
+        .annotate(last_run=Max('runs__started_at'))
+        .filter(Q(last_run__isnull=True) | Q(last_run__lt=cutoff))
+    )
+
+
+def prune_orphan_blobs() -> int:
+    """Delete blobs no response or run version points at any more"""
+    referenced = Q(id__in=PromptResponse.objects.exclude(blob=None).values('blob_id')) | Q(
+        id__in=RunResponse.objects.exclude(blob=None).values('blob_id')
+    )
+    orphans = ResponseBlob.objects.exclude(referenced)
+    with transaction.atomic():
+        unindex_blobs(orphans)
+        return orphans.delete()[0]
+
+
+def archive_project(project: VisibilityProject) -> Dict[str, int]:
+    """
+    Write the project's responses, mentions, sentiment, run versions and logs to its archive file,
+    then remove them from the live tables; scores, reports and run history stay
+    """
+    if project.archived_at:
+        raise ArchiveError(f'Project {project.id} is already archived')
+    if live_impersonations().filter(source_project=project).exists():
+        raise ArchiveError(f'Project {project.id} is the source of live impersonation projects')
+    if live_shared_copies().filter(source_response__project=project).exists():
+        raise ArchiveError(f'Project {project.id} has responses reused by live projects')
+
+    path = archive_path(project.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.tmp')
+
+    counts = {}
+    with gzip.open(partial, 'wt', encoding='utf-8') as stream:
+        for queryset in _archived_querysets(project.id):
+            rows = list(queryset.order_by('pk').iterator(chunk_size=1000))
+            serializers.serialize('jsonl', rows, stream=stream)
+            counts[queryset.model._meta.model_name] = len(rows)
+    os.replace(partial, path)
+
+    with transaction.atomic():
+        # Mentions, sentiment and run versions cascade with the responses
+        PromptResponse.objects.filter(project=project).delete()
+        ExecutionLog.objects.filter(project=project).delete()
+        project.archived_at = timezone.now()
+        project.save(update_fields=['archived_at'])
+
+    counts['pruned_blobs'] = prune_orphan_blobs()
+    return counts
+
+
+def restore_project(project: VisibilityProject) -> Dict[str, int]:
+    """Load an archived project's raw data back into the live tables"""
+    path = archive_path(project.id)
+    if not project.archived_at:
+        raise ArchiveError(f'Project {project.id} is not archived')
+    if not path.exists():
+        raise ArchiveError(f'Archive file {path} is missing')
+
+    counts = {}
+    blob_ids = {}  # archived blob id -> live blob id; blobs are shared, so match them by digest
+    with gzip.open(path, 'rt', encoding='utf-8') as stream, transaction.atomic():
+        # Archives written before a field was dropped still carry it
+        for item in serializers.deserialize('jsonl', stream, ignorenonexistent=True):
+            obj = item.object
+
+            if isinstance(obj, ResponseBlob):
+                live, _ = ResponseBlob.objects.get_or_create(
+                    digest=obj.digest, defaults={'data': obj.data, 'size': obj.size}
+                )
+                blob_ids[obj.id] = live.id
+                counts['responseblob'] = counts.get('responseblob', 0) + 1
+                continue
+
+            if isinstance(obj, (PromptResponse, RunResponse)) and obj.blob_id is not None:
+                obj.blob_id = blob_ids[obj.blob_id]
+            if isinstance(obj, PromptResponse) and obj.source_response_id is not None:
+                # The shared source may have been archived or deleted since
+                if not PromptResponse.objects.filter(id=obj.source_response_id).exists():
+                    obj.source_response_id = None
+
+            item.save()
+            name = obj._meta.model_name
+            counts[name] = counts.get(name, 0) + 1
+
+        project.archived_at = None
+        project.save(update_fields=['archived_at'])
+
+    path.unlink()
+    return counts
@@ -0,0 +1,281 @@
+"""
+Run history
+Versions responses, mentions and scores per execution and keeps daily/weekly brand rollups
+"""
+import hashlib
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .refresh_policy import ranking_change, update_volatility
+from .retention import restore_project
+from .models import (
+    VisibilityProject, PromptResponse, BrandMention, VisibilityScore,
+    Run, RunResponse, RunScore, BrandRollup, ExecutionLog, ResponseBlob
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ('day', 'week')
+
+
+def content_hash(text: str) -> str:
+    """Hash of an answer with whitespace collapsed, so reformatting alone is not a change"""
+    return hashlib.sha256(' '.join((text or '').split()).encode('utf-8')).hexdigest()
+
+
+def start_run(project: VisibilityProject, trigger: str = 'manual') -> Run:
+    """Open the next numbered run for a project"""
+    if project.archived_at:
+        # Refreshing compares against the previous answers, so bring them back first
+        restore_project(project)
+
+    with transaction.atomic():
+        last = (
+            Run.objects.select_for_update()
+            .filter(project=project)
+            .order_by('-number')
+            .values_list('number', flat=True)
+            .first()
+        )
+        run = Run.objects.create(project=project, number=(last or 0) + 1, trigger=trigger)
+
+    ExecutionLog.objects.create(
+        project=project,
+        module='runs',
+        level='info',
+        message=f'Started run #{run.number}',
+        details={'run_id': run.id, 'trigger': trigger}
+    )
+    return run
+
+
+def current_run(project: VisibilityProject) -> Optional[Run]:
+    """Latest run still in flight"""
+    return Run.objects.filter(project=project, status='running').order_by('-number').first()
+
+
+def _previous_versions(run: Run, response_ids: List[int]) -> Dict[int, Tuple[str, List]]:
+    """response id -> (content hash, mention ranking) recorded by the most recent earlier run"""
+    latest = (
+        RunResponse.objects.filter(response_id=OuterRef('response_id'), run__number__lt=run.number)
+        .order_by('-run__number')
+        .values('id')[:1]
+    )
+    rows = RunResponse.objects.filter(
+        response_id__in=response_ids,
+        id=Subquery(latest)
+    ).values_list('response_id', 'content_hash', 'mention_ranking')
+    return {response_id: (digest, ranking) for response_id, digest, ranking in rows}
+
+
+def _mention_rankings(response_ids: List[int]) -> Dict[int, List[List]]:
+    rankings = {}
+    rows = (
+        BrandMention.objects.filter(response_id__in=response_ids)
+        .order_by('response_id', 'position')
+        .values_list('response_id', 'brand__name', 'position', 'sentiment__sentiment')
+    )
+    for response_id, brand, position, sentiment in rows:
+        rankings.setdefault(response_id, []).append([brand, position, sentiment])
+    return rankings
+
+
+def snapshot_run(run: Run) -> Dict:
+    """
+    Record the answers refreshed by this run and the current scores
+
+    Versions reference the answer's blob, so an unchanged answer costs no extra text storage.
+    Each refreshed answer's volatility is updated from how far its ranking moved.
+    """
+    responses = list(
+        PromptResponse.objects.filter(run=run, status='success').values_list(
+            'id', 'content_hash', 'blob_id', 'volatility'
+        )
+    )
+    response_ids = [response_id for response_id, _, _, _ in responses]
+    previous = _previous_versions(run, response_ids)
+    rankings = _mention_rankings(response_ids)
+
+    versions = []
+    volatility_updates = []
+    changed = 0
+    for response_id, digest, blob_id, volatility in responses:
+        previous_hash, previous_ranking = previous.get(response_id, (None, None))
+        is_changed = previous_hash != digest
+        changed += is_changed
+
+        if previous_hash is not None:
+            movement = ranking_change(previous_ranking, rankings.get(response_id, [])) if is_changed else 0.0
+            volatility_updates.append(PromptResponse(id=response_id, volatility=update_volatility(volatility, movement)))
+
+        versions.append(RunResponse(
+            run=run,
+            response_id=response_id,
+            content_hash=digest,
+            blob_id=blob_id,
+            changed=is_changed,
+            mention_ranking=rankings.get(response_id, [])
+        ))
+
+    scores = [
+        RunScore(
+            run=run,
+            brand_name=score.brand.name,
+            is_main_brand=score.is_main_brand,
+            frequency_score=score.frequency_score,
+            prominence_score=score.prominence_score,
+            sentiment_score=score.sentiment_score,
+            model_coverage_score=score.model_coverage_score,
+            normalized_score=score.normalized_score,
+            total_mentions=score.total_mentions,
+            prompts_appeared_in=score.prompts_appeared_in
+        )
+        for score in VisibilityScore.objects.filter(project_id=run.project_id).select_related('brand')
+    ]
+
+    with transaction.atomic():
+        RunResponse.objects.filter(run=run).delete()
+        RunScore.objects.filter(run=run).delete()
+        RunResponse.objects.bulk_create(versions)
+        RunScore.objects.bulk_create(scores)
+        PromptResponse.objects.bulk_update(volatility_updates, ['volatility'], batch_size=500)
+
+    stats = {
+        'refreshed': len(versions),
+        'changed': changed,
+        'unchanged': len(versions) - changed,
+        'carried_forward': PromptResponse.objects.filter(
+            project_id=run.project_id, status='success'
+        ).exclude(run=run).count()
+    }
+    run.stats = {**run.stats, **stats}
+    run.save(update_fields=['stats'])
+    return stats
+
+
+def finish_run(run: Run, status: str = 'completed') -> None:
+    """Close a run and refresh the rollups covering it"""
+    run.status = status
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at'])
+
+    if status == 'completed':
+        try:
+            update_rollups(run.project_id, timezone.localdate(run.started_at))
+        except Exception:
+            logger.exception(f"Failed to update rollups for run {run.id}")
+
+    ExecutionLog.objects.create(
+        project_id=run.project_id,
+        module='runs',
+        level='info' if status == 'completed' else 'error',
+        message=f'Run #{run.number} {status}',
+        details={'run_id': run.id, **run.stats}
+    )
+
+
+def period_bounds(period: str, day: date) -> Tuple[date, date]:
+    """First day of the period containing `day` and the first day after it"""
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    return day, day + timedelta(days=1)
+
+
+def _aware(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def update_rollups(project_id: int, day: date) -> None:
+    """Recompute the daily and weekly rollups containing `day` from completed run scores"""
+    for period in ROLLUP_PERIODS:
+        start, end = period_bounds(period, day)
+        scores = RunScore.objects.filter(
+            run__project_id=project_id,
+            run__status='completed',
+            run__started_at__gte=_aware(start),
+            run__started_at__lt=_aware(end)
+        )
+        main_brands = set(scores.filter(is_main_brand=True).values_list('brand_name', flat=True))
+        rows = (
+            scores.values('brand_name')
+            .annotate(
+                run_count=Count('run', distinct=True),
+                avg_score=Avg('normalized_score'),
+                min_score=Min('normalized_score'),
+                max_score=Max('normalized_score'),
+                avg_frequency=Avg('frequency_score'),
+                avg_prominence=Avg('prominence_score'),
+                avg_sentiment=Avg('sentiment_score'),
+                total_mentions=Sum('total_mentions')
+            )
+        )
+
+        with transaction.atomic():
+            for row in rows:
+                brand = row.pop('brand_name')
+                row['is_main_brand'] = brand in main_brands
+                BrandRollup.objects.update_or_create(
+                    project_id=project_id,
+                    brand_name=brand,
+                    period=period,
+                    period_start=start,
+                    defaults=row
+                )
+
+
+def rebuild_rollups(project_id: int) -> int:
+    """Recompute every rollup of a project from its run history; returns the number of days covered"""
+    BrandRollup.objects.filter(project_id=project_id).delete()
+    days = sorted({
+        timezone.localdate(started_at)
+        for started_at in Run.objects.filter(project_id=project_id, status='completed').values_list('started_at', flat=True)
+    })
+    for day in days:
+        update_rollups(project_id, day)
+    return len(days)
+
+
+def version_text(version: RunResponse) -> str:
+    """Answer text of a run version, resolved from the last version with a stored blob"""
+    if version.blob_id:
+        return version.raw_response
+
+    data = (
+        RunResponse.objects.filter(
+            response_id=version.response_id,
+            content_hash=version.content_hash,
+            run__number__lte=version.run.number,
+            blob__isnull=False
+        )
+        .order_by('-run__number')
+        .values_list('blob__data', flat=True)
+        .first()
+    )
+    return ResponseBlob.decompress(data)
+
+
+def brand_trends(project_id: int, period: str = 'week', brand: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """brand -> rollup series ordered by period start"""
+    rollups = BrandRollup.objects.filter(project_id=project_id, period=period)
+    if brand:
+        rollups = rollups.filter(brand_name__iexact=brand)
+
+    series = {}
+    for rollup in rollups.order_by('period_start'):
+        series.setdefault(rollup.brand_name, []).append({
+            'period_start': rollup.period_start.isoformat(),
+            'runs': rollup.run_count,
+            'avg_score': round(rollup.avg_score, 2),
+            'min_score': round(rollup.min_score, 2),
+            'max_score': round(rollup.max_score, 2),
+            'avg_frequency': round(rollup.avg_frequency, 4),
+            'avg_prominence': round(rollup.avg_prominence, 4),
+            'avg_sentiment': round(rollup.avg_sentiment, 4),
+            'total_mentions': rollup.total_mentions
+        })
+    return series
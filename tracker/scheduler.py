@@ -0,0 +1,253 @@
+"""
+Monitoring scheduler
+Re-runs projects on cron-like schedules, spreading start times and honoring provider budgets
+"""
+import hashlib
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .ai_config import REASONING_PROVIDER
+from .models import MonitoringSchedule, Run, ExecutionLog, BrandMention
+from .module2_engine import run_module2
+from .module3_engine import run_module3
+from .provider_budget import fits_budget
+from .runs import start_run, current_run
+
+logger = logging.getLogger(__name__)
+
+# (name, min, max) of the five cron fields
+CRON_FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 6),  # 0 = Sunday, 7 is accepted as Sunday too
+]
+
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+# Module 3 LLM sections per run (insights, action plan)
+REPORT_LLM_CALLS = 2
+
+
+class CronError(ValueError):
+    pass
+
+
+class CronSchedule:
+    """
+    Minimal five-field cron expression: numbers, '*', ranges 'a-b', steps '*/n' or 'a-b/n', and lists
+    Day of month and weekday match either one when both are restricted, as in cron
+    """
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise CronError(f'Expected 5 fields in cron expression, got {len(parts)}: {expression!r}')
+
+        self.expression = expression
+        fields = [self._parse(part, name, low, high) for part, (name, low, high) in zip(parts, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, '*/n' counts as unrestricted here
+        self.day_restricted = not parts[2].startswith('*')
+        self.weekday_restricted = not parts[4].startswith('*')
+
+    @staticmethod
+    def _parse(part: str, name: str, low: int, high: int) -> Set[int]:
+        if name == 'weekday':
+            high = 7
+
+        values = set()
+        for item in part.split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                if not step_text.isdigit() or int(step_text) == 0:
+                    raise CronError(f'Invalid step in {name} field: {part!r}')
+                step = int(step_text)
+
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start_text, end_text = item.split('-', 1)
+                if not (start_text.isdigit() and end_text.isdigit()):
+                    raise CronError(f'Invalid range in {name} field: {part!r}')
+                start, end = int(start_text), int(end_text)
+            elif item.isdigit():
+                start = int(item)
+                end = high if step > 1 else start
+            else:
+                raise CronError(f'Invalid value in {name} field: {part!r}')
+
+            if start < low or end > high or start > end:
+                raise CronError(f'{name} field out of range {low}-{high}: {part!r}')
+            values.update(range(start, end + 1, step))
+
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+
+        in_days = day.day in self.days
+        # Python: Monday = 0; cron: Sunday = 0
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        """First fire time strictly after `after`, in the same timezone"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+
+        raise CronError(f'Cron expression never fires: {self.expression!r}')
+
+
+def stagger_offset(project_id: int, stagger_minutes: int) -> timedelta:
+    """Stable per-project delay so projects sharing a schedule do not all start together"""
+    if stagger_minutes <= 0:
+        return timedelta(0)
+    digest = hashlib.sha256(f'schedule:{project_id}'.encode('utf-8')).digest()
+    return timedelta(seconds=int.from_bytes(digest[:4], 'big') % (stagger_minutes * 60))
+
+
+def next_run_time(schedule: MonitoringSchedule, after: Optional[datetime] = None) -> datetime:
+    after = after or timezone.now()
+    offset = stagger_offset(schedule.project_id, schedule.stagger_minutes)
+    # Fire times are computed without the offset so the offset never skips a slot
+    return CronSchedule(schedule.cron_expression).next_after(after - offset) + offset
+
+
+def estimated_calls(schedule: MonitoringSchedule) -> Dict[str, int]:
+    """Provider calls one run of the project would send: model queries, sentiment and report sections"""
+    project = schedule.project
+    prompt_count = project.prompts.filter(is_selected=True).count()
+    providers = list(project.selected_models.filter(is_selected=True).values_list('model__name', flat=True))
+
+    per_provider = prompt_count
+    if schedule.call_budget is not None and providers:
+        # The call budget is spread over providers; assume an even split
+        per_provider = min(prompt_count, math.ceil(schedule.call_budget / len(providers)))
+    calls = {name: per_provider for name in providers}
+
+    # Sentiment is analysed once per mention of every refreshed answer; assume the mentions per answer
+    # seen so far, or one per tracked brand before the first run
+    answers = project.responses.filter(status='success').count()
+    mentions_per_answer = (
+        BrandMention.objects.filter(response__project=project).count() / answers
+        if answers else project.tracked_brands.count()
+    )
+    reasoning = math.ceil(per_provider * len(providers) * mentions_per_answer) + REPORT_LLM_CALLS
+    calls[REASONING_PROVIDER] = calls.get(REASONING_PROVIDER, 0) + reasoning
+    return calls
+
+
+def fail_stale_runs(now: datetime) -> int:
+    """Close runs left 'running' by a crashed worker so their projects can be scheduled again"""
+    cutoff = now - timedelta(hours=settings.SCHEDULER_STALE_RUN_HOURS)
+    stale = list(Run.objects.filter(status='running', started_at__lt=cutoff))
+    for run in stale:
+        run.status = 'failed'
+        run.finished_at = now
+        run.save(update_fields=['status', 'finished_at'])
+        ExecutionLog.objects.create(
+            project_id=run.project_id,
+            module='scheduler',
+            level='warning',
+            message=f'Marked stale run #{run.number} as failed'
+        )
+    return len(stale)
+
+
+def _execute_run(project_id: int, run_id: int):
+    try:
+        if run_module2(project_id, run_id):
+            run_module3(project_id, run_id)
+    finally:
+        connection.close()
+
+
+def _skip(schedule: MonitoringSchedule, reason: str, now: datetime):
+    schedule.last_skip_reason = reason
+    schedule.next_run_at = next_run_time(schedule, now)
+    schedule.save(update_fields=['last_skip_reason', 'next_run_at'])
+
+    ExecutionLog.objects.create(
+        project=schedule.project,
+        module='scheduler',
+        level='warning',
+        message=f'Skipped scheduled run: {reason}',
+        details={'next_run_at': schedule.next_run_at.isoformat()}
+    )
+
+
+def tick(now: Optional[datetime] = None) -> List[threading.Thread]:
+    """
+    Start every due schedule once
+
+    Returns: the worker threads started, so callers can wait for them
+    """
+    now = now or timezone.now()
+    fail_stale_runs(now)
+
+    # Schedules without a next time are initialised rather than fired immediately
+    for schedule in MonitoringSchedule.objects.filter(is_active=True, next_run_at__isnull=True):
+        schedule.next_run_at = next_run_time(schedule, now)
+        schedule.save(update_fields=['next_run_at'])
+
+    due = MonitoringSchedule.objects.filter(
+        is_active=True, next_run_at__lte=now
+    ).select_related('project').order_by('next_run_at')
+
+    threads = []
+    running = Run.objects.filter(status='running').count()
+    for schedule in due:
+        project = schedule.project
+
+        if running >= settings.SCHEDULER_MAX_CONCURRENT_RUNS:
+            # Still due; picked up on a later tick once a slot frees up
+            break
+
+        if current_run(project) is not None:
+            _skip(schedule, 'previous run still in flight', now)
+            continue
+
+        if not project.prompts.filter(is_selected=True).exists():
+            _skip(schedule, 'no selected prompts', now)
+            continue
+
+        short_provider = fits_budget(estimated_calls(schedule))
+        if short_provider:
+            _skip(schedule, f'daily call budget for {short_provider} would be exceeded', now)
+            continue
+
+        run = start_run(project, trigger='scheduled')
+        schedule.last_run = run
+        schedule.last_run_at = now
+        schedule.last_skip_reason = ''
+        schedule.next_run_at = next_run_time(schedule, now)
+        schedule.save(update_fields=['last_run', 'last_run_at', 'last_skip_reason', 'next_run_at'])
+
+        thread = threading.Thread(target=_execute_run, args=(project.id, run.id), daemon=True)
+        thread.start()
+        threads.append(thread)
+        running += 1
+
+    return threads
@@ -0,0 +1,181 @@
+"""
+Full-text search
+Indexes every distinct answer text (one ResponseBlob) once and finds the responses whose answer matches a query
+
+SQLite uses a contentless FTS5 table keyed by blob id, PostgreSQL a tsvector table with a GIN index. Answers stay
+compressed in the blob store; snippets are cut from the decompressed text of the returned page only.
+"""
+import html
+import re
+from typing import Dict, List, Tuple
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import ResponseBlob
+
+SEARCH_TABLE = 'tracker_response_search'
+SNIPPET_CHARS = 240
+SEARCH_VENDORS = ('sqlite', 'postgresql')
+
+# Quoted phrases or bare words, as typed into the search box
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+class SearchUnavailable(Exception):
+    """The database has no full-text index"""
+    pass
+
+
+def parse_query(query: str) -> List[List[Tuple[str, ...]]]:
+    """
+    Split a query into OR-ed groups of AND-ed terms; a term is a word or a quoted phrase
+
+    'free tier OR "SOC 2"' -> [[('free',), ('tier',)], [('soc', '2')]]
+    """
+    groups = [[]]
+    for match in QUERY_TOKEN_PATTERN.finditer(query or ''):
+        phrase, word = match.groups()
+        if word is not None and word.upper() == 'OR':
+            groups.append([])
+            continue
+        tokens = tuple(token.lower() for token in WORD_PATTERN.findall(phrase if phrase is not None else word))
+        if tokens:
+            groups[-1].append(tokens)
+
+    groups = [group for group in groups if group]
+    if not groups:
+        raise InvalidQuery('q must contain at least one word')
+    return groups
+
+
+def fts5_expression(groups) -> str:
+    def phrase(tokens):
+        return '"' + ' '.join(tokens) + '"'
+    return ' OR '.join('(' + ' AND '.join(phrase(term) for term in group) + ')' for group in groups)
+
+
+def tsquery_expression(groups) -> str:
+    def phrase(tokens):
+        return ' <-> '.join(f"'{token}'" for token in tokens)
+    return ' | '.join('(' + ' & '.join(f'({phrase(term)})' for term in group) + ')' for group in groups)
+
+
+def highlight_pattern(groups) -> re.Pattern:
+    """Case-insensitive pattern for every term; phrase words may be separated by any punctuation"""
+    terms = sorted({term for group in groups for term in group}, key=lambda term: -sum(map(len, term)))
+    return re.compile(
+        '|'.join(r'\b' + r'\W+'.join(re.escape(token) for token in term) + r'\b' for term in terms),
+        re.IGNORECASE
+    )
+
+
+def snippet(text: str, pattern: re.Pattern, length: int = SNIPPET_CHARS) -> str:
+    """HTML-escaped excerpt around the first match with every match wrapped in <mark>"""
+    first = pattern.search(text)
+    start = max(0, first.start() - length // 3) if first else 0
+    if start:
+        # Don't cut a word in half
+        space = text.find(' ', start, first.start())
+        start = space + 1 if space >= 0 else start
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    excerpt = text[start:end]
+    parts, position = [], 0
+    for match in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[position:match.start()]))
+        parts.append(f'<mark>{html.escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(html.escape(excerpt[position:]))
+
+    return ('…' if start else '') + ''.join(parts).replace('\n', ' ') + ('…' if end < len(text) else '')
+
+
+def index_blob(blob: ResponseBlob, using: str = 'default'):
+    """Add a new blob's text to the index; blobs are immutable, so this happens once"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (%s, %s)', [blob.id, blob.text])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (blob_id, document) VALUES (%s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (blob_id) DO NOTHING",
+                [blob.id, blob.text]
+            )
+
+
+def unindex_blobs(blobs):
+    """
+    Remove blobs about to be deleted from the index
+
+    A contentless FTS5 table needs the original text to delete a row; PostgreSQL rows cascade with the blob.
+    """
+    connection = connections[blobs.db]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for blob_id, data in blobs.values_list('id', 'data').iterator():
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text) VALUES ('delete', %s, %s)",
+                [blob_id, ResponseBlob.decompress(data)]
+            )
+
+
+def _matching_blob_ids(vendor: str, groups) -> Tuple[str, List]:
+    if vendor == 'sqlite':
+        return f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [fts5_expression(groups)]
+    return (
+        f"SELECT blob_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+        [tsquery_expression(groups)]
+    )
+
+
+def search_responses(responses, query: str, limit: int, offset: int = 0) -> Dict:
+    """
+    Page of `responses` (a PromptResponse queryset, already filtered) whose answer matches `query`, newest first
+
+    Raises InvalidQuery for a query without words and SearchUnavailable on databases without an index.
+    """
+    vendor = connections[responses.db].vendor
+    if vendor not in SEARCH_VENDORS:
+        raise SearchUnavailable(f'Full-text search is not available on {vendor}')
+
+    groups = parse_query(query)
+    sql, params = _matching_blob_ids(vendor, groups)
+    matches = responses.filter(blob_id__in=RawSQL(sql, params))
+
+    total = matches.count()
+    rows = list(
+        matches.select_related('project', 'prompt', 'model', 'blob')
+        .order_by('-completed_at', '-id')[offset:offset + limit]
+    )
+
+    pattern = highlight_pattern(groups)
+    return {
+        'query': query,
+        'total': total,
+        'results': [
+            {
+                'response_id': response.id,
+                'project_id': response.project_id,
+                'company_name': response.project.company_name,
+                'prompt_id': response.prompt_id,
+                'prompt': response.prompt.text,
+                'model_id': response.model_id,
+                'model': response.model.name,
+                'model_display_name': response.model.display_name,
+                'completed_at': response.completed_at.isoformat() if response.completed_at else None,
+                'snippet': snippet(response.raw_response, pattern),
+            }
+            for response in rows
+        ],
+        'next_offset': offset + limit if offset + limit < total else None,
+    }
@@ -0,0 +1,38 @@
+"""
+Signal handlers for the tracker app
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DetailedReport, ResponseBlob, VisibilityScore
+from .report_snapshot import invalidate_snapshot
+from .search import index_blob
+
+
+@receiver([post_save, post_delete], sender=DetailedReport)
+@receiver([post_save, post_delete], sender=VisibilityScore)
+def invalidate_report_snapshot(sender, instance, **kwargs):
+    """Drop the cached report snapshot when its report or scores change"""
+    invalidate_snapshot(instance.project_id)
+
+
+@receiver(post_save, sender=ResponseBlob)
+def index_response_text(sender, instance, created, using, **kwargs):
+    """Keep the full-text index in step with the blob store, inside the transaction that stored the text"""
+    if created:
+        index_blob(instance, using=using)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """WAL lets web requests read while a run writes; the busy timeout waits for the lock instead of erroring"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_HIGH_CONCURRENCY:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}')
+        # Safe with WAL: a crash can lose the last commits but never corrupts the database
+        cursor.execute('PRAGMA synchronous=NORMAL')
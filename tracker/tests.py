@@ -1,3 +1,313 @@
-from django.test import TestCase
+"""
+Tests for the tracker app
 
-# Create your tests here.
+They run against whichever backend DB_ENGINE selects; `python manage.py test_backends` runs them on
+SQLite and, when psycopg is installed, on the local PostgreSQL from the POSTGRES_* settings
+"""
+import tempfile
+import time
+import unittest
+import warnings
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import views
+from .db_routing import REPLICA_ALIAS, ReplicaRouter
+from .execution_log import ExecutionLogBuffer
+from .models import (
+    VisibilityProject, Brand, Competitor, Prompt, AIModel, ModelSelection,
+    PromptResponse, BrandMention, SentimentScore, VisibilityScore, DetailedReport, ExecutionLog
+)
+from .module2_engine import VisibilityCheckEngine
+from .report_snapshot import snapshot_cache_key
+from .retention import ArchiveError, archivable_projects, archive_project
+
+
+def create_project(answers):
+    """Project 'Acme' with competitor 'Beta', one selected model and a successful response per answer"""
+    user = User.objects.create_user(username=f'user{User.objects.count()}', password='pw')
+    project = VisibilityProject.objects.create(
+        user=user, name='Acme check', company_name='Acme', company_description='CRM', area_of_work='CRM software'
+    )
+    Brand.objects.create(project=project, name='Acme')
+    Competitor.objects.create(project=project, name='Beta', is_validated=True)
+    model, _ = AIModel.objects.get_or_create(name='chatgpt', defaults={'display_name': 'ChatGPT'})
+    ModelSelection.objects.create(project=project, model=model)
+
+    for index, answer in enumerate(answers):
+        prompt = Prompt.objects.create(project=project, text=f'best crm {index}?', is_selected=True)
+        response = PromptResponse(project=project, prompt=prompt, model=model, status='success')
+        response.raw_response = answer
+        response.save()
+    return project
+
+
+def upserts(queries, table):
+    return [query['sql'] for query in queries if query['sql'].startswith(f'INSERT INTO "{table}"') and 'ON CONFLICT' in query['sql']]
+
+
+class UpsertTests(TestCase):
+    """Module 2 writes mentions, sentiment and scores with INSERT ... ON CONFLICT DO UPDATE"""
+
+    def setUp(self):
+        self.project = create_project(['Acme leads, Beta follows.', 'Beta is cheaper than Acme.'])
+        self.engine = VisibilityCheckEngine(self.project.id)
+
+    def test_mentions_upsert_keeps_ids_and_refreshes_positions(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.engine.extract_mentions()
+        self.assertEqual(len(upserts(queries, 'tracker_brandmention')), 1)
+        first = dict(BrandMention.objects.values_list('id', 'position'))
+        self.assertEqual(len(first), 4)
+
+        response = PromptResponse.objects.filter(project=self.project).order_by('id').first()
+        response.raw_response = 'Beta first, then Acme.'
+        response.save()
+        self.engine.extract_mentions()
+
+        second = dict(BrandMention.objects.values_list('id', 'position'))
+        self.assertEqual(set(second), set(first))
+        self.assertEqual(
+            list(BrandMention.objects.filter(response=response).order_by('position').values_list('brand__name', flat=True)),
+            ['Beta', 'Acme']
+        )
+
+    def test_sentiment_upsert_updates_in_place(self):
+        self.engine.extract_mentions()
+        mentions = list(BrandMention.objects.all())
+
+        self.engine._save_sentiments([SentimentScore(mention=m, sentiment='neutral') for m in mentions])
+        with CaptureQueriesContext(connection) as queries:
+            self.engine._save_sentiments([SentimentScore(mention=m, sentiment='positive', reasoning='r') for m in mentions])
+
+        self.assertEqual(len(upserts(queries, 'tracker_sentimentscore')), 1)
+        self.assertEqual(SentimentScore.objects.count(), len(mentions))
+        self.assertEqual(set(SentimentScore.objects.values_list('sentiment', flat=True)), {'positive'})
+
+    def test_scores_upsert_one_row_per_brand(self):
+        self.engine.extract_mentions()
+        self.engine.calculate_scores()
+        before = dict(VisibilityScore.objects.values_list('brand__name', 'updated_at'))
+
+        BrandMention.objects.filter(brand__name='Beta').delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.engine.calculate_scores()
+
+        self.assertEqual(len(upserts(queries, 'tracker_visibilityscore')), 1)
+        scores = {score.brand.name: score for score in VisibilityScore.objects.select_related('brand')}
+        self.assertEqual(set(scores), {'Acme', 'Beta'})
+        self.assertEqual(scores['Beta'].total_mentions, 0)
+        self.assertGreater(scores['Beta'].updated_at, before['Beta'])
+
+
+@override_settings(SHARED_RESPONSE_STORE_ENABLED=True)
+class SharedResponseStoreTests(TestCase):
+    """Projects asking the same question reuse each other's fresh answers, never their own"""
+
+    def query(self, project, answer):
+        engine = VisibilityCheckEngine(project.id)
+        with mock.patch.object(engine, '_invoke_model', return_value=(True, answer, '')) as invoke:
+            engine.query_models()
+        engine.log.close()
+        return invoke.call_count, PromptResponse.objects.get(project=project)
+
+    def test_reused_answer_is_not_handed_back_to_its_source(self):
+        first, second = create_project(['stale']), create_project(['stale'])
+
+        calls, original = self.query(first, 'Acme leads.')
+        self.assertEqual((calls, original.source_response_id), (1, None))
+
+        calls, copy = self.query(second, 'unused')
+        self.assertEqual((calls, copy.source_response_id, copy.raw_response), (0, original.id, 'Acme leads.'))
+
+        calls, rerun = self.query(first, 'Beta leads now.')
+        self.assertEqual(calls, 1)
+        self.assertIsNone(rerun.source_response_id)
+        self.assertEqual(rerun.raw_response, 'Beta leads now.')
+
+
+class ExecutionLogBufferTests(TransactionTestCase):
+    """Buffered log rows reach the database within max_age even if nothing else is logged"""
+
+    def test_timer_flushes_old_entries(self):
+        project = create_project([])
+        log = ExecutionLogBuffer(max_entries=100, max_age=0.2)
+        log.add(project=project, module='module2', level='info', message='Querying models')
+        self.assertFalse(ExecutionLog.objects.filter(project=project).exists())
+
+        deadline = time.monotonic() + 5
+        while not ExecutionLog.objects.filter(project=project).exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(ExecutionLog.objects.filter(project=project).exists())
+        log.close()
+
+
+class ArchivalTests(TestCase):
+    """Projects whose responses live impersonations or shared-store copies use are never archived"""
+
+    def test_impersonation_source_is_kept_until_the_impersonation_is_archived(self):
+        source = create_project(['Acme leads, Beta follows.'])
+        impersonation = create_project([])
+        impersonation.source_project = source
+        impersonation.save()
+        VisibilityProject.objects.update(status='completed', updated_at=timezone.now() - timedelta(days=365))
+
+        self.assertNotIn(source, archivable_projects(days=30))
+        with self.assertRaises(ArchiveError):
+            archive_project(source)
+
+        VisibilityProject.objects.filter(id=impersonation.id).update(archived_at=timezone.now())
+        self.assertIn(source, archivable_projects(days=30))
+
+    def test_shared_store_source_is_kept_while_a_copy_is_live(self):
+        source, reuser = create_project(['Acme leads, Beta follows.']), create_project(['Acme leads, Beta follows.'])
+        PromptResponse.objects.filter(project=reuser).update(
+            source_response=PromptResponse.objects.get(project=source)
+        )
+        VisibilityProject.objects.update(status='completed', updated_at=timezone.now() - timedelta(days=365))
+
+        self.assertNotIn(source, archivable_projects(days=30))
+        self.assertIn(reuser, archivable_projects(days=30))
+        with self.assertRaises(ArchiveError):
+            archive_project(source)
+
+        VisibilityProject.objects.filter(id=reuser.id).update(archived_at=timezone.now())
+        self.assertIn(source, archivable_projects(days=30))
+
+
+@unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'No full-text index on this backend')
+class SearchTests(TestCase):
+    """Full-text search over the user's own responses, filtered by ids"""
+
+    def setUp(self):
+        self.project = create_project(['Acme is SOC-2 compliant.', 'Beta has a free tier.'])
+        create_project(['Other users: SOC 2 too.'])
+        self.client.force_login(self.project.user)
+
+    def test_phrases_filters_and_snippets(self):
+        model = AIModel.objects.get(name='chatgpt')
+        page = self.client.get('/api/search/', {'q': '"SOC 2" OR "free tier"', 'model': model.id}).json()
+        self.assertEqual(page['total'], 2)
+        self.assertIn('Acme is <mark>SOC-2</mark> compliant.', [result['snippet'] for result in page['results']])
+
+        page = self.client.get('/api/search/', {'q': 'soc', 'project': self.project.id}).json()
+        self.assertEqual(page['total'], 1)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'soc', 'model': 'chatgpt'}).status_code, 400)
+
+
+class UniqueMentionMigrationTests(TransactionTestCase):
+    """Migration 0014 drops duplicate mentions before adding the (response, brand) constraint"""
+
+    before = [('tracker', '0013_hot_query_indexes')]
+    after = [('tracker', '0014_unique_brand_mention')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged_onto_earliest_position(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+
+        user = apps.get_model('auth', 'User').objects.create(username='migration')
+        project = apps.get_model('tracker', 'VisibilityProject').objects.create(
+            user_id=user.id, name='x', company_name='Acme', company_description='d', area_of_work='a'
+        )
+        model = apps.get_model('tracker', 'AIModel').objects.create(name='claude', display_name='Claude')
+        prompt = apps.get_model('tracker', 'Prompt').objects.create(project=project, text='q')
+        response = apps.get_model('tracker', 'PromptResponse').objects.create(
+            project=project, prompt=prompt, model=model, raw_response='Acme', status='success'
+        )
+        brand = apps.get_model('tracker', 'TrackedBrand').objects.create(project=project, name='Acme', key='acme')
+        Mention = apps.get_model('tracker', 'BrandMention')
+        for position in (3, 1, 2):
+            Mention.objects.create(response=response, brand=brand, position=position, context='c')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        self.assertEqual(
+            list(apps.get_model('tracker', 'BrandMention').objects.values_list('position', flat=True)),
+            [1]
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'The replica is a second SQLite file refreshed by sync_replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    """Read-only views read the replica file until the user starts a run, then the primary"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists while this class runs, so it is declared here rather than on the class
+        cls.databases = {'default', REPLICA_ALIAS}
+        cls.directory = tempfile.TemporaryDirectory()
+        replica = {**connections['default'].settings_dict, 'NAME': str(Path(cls.directory.name) / 'replica.sqlite3')}
+        connections.settings[REPLICA_ALIAS] = replica
+        cls.databases_override = override_settings(DATABASES={**settings.DATABASES, REPLICA_ALIAS: replica})
+        with warnings.catch_warnings():
+            # Connections are registered above; the override only makes replica_configured() see the alias
+            warnings.simplefilter('ignore', UserWarning)
+            cls.databases_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        cls.databases_override.disable()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.project = create_project(['Acme leads, Beta follows.'])
+        self.project.status = 'completed'
+        self.project.save()
+        DetailedReport.objects.create(project=self.project, why_competitors_win='Synced')
+        call_command('sync_replica', stdout=StringIO())
+
+        # Only on the primary
+        unsynced = create_project(['Acme'])
+        VisibilityProject.objects.filter(id=unsynced.id).update(company_name='Zeta', user=self.project.user)
+        DetailedReport.objects.filter(project=self.project).update(why_competitors_win='Primary only')
+
+        self.client.force_login(self.project.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_router_sends_only_tracker_reads_to_the_chosen_alias(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(VisibilityProject))
+        self.assertEqual(router.db_for_write(VisibilityProject), 'default')
+        self.assertEqual(VisibilityProject.objects.using(REPLICA_ALIAS).count(), 1)
+        self.assertEqual(VisibilityProject.objects.count(), 2)
+
+    def test_reads_come_from_replica_until_the_user_starts_a_run(self):
+        self.assertNotContains(self.client.get('/dashboard/'), 'Zeta')
+        payload = self.client.get(f'/api/project/{self.project.id}/report/').json()
+        self.assertEqual(payload['insights']['why_competitors_win'], 'Synced')
+        # A lagging replica's snapshot must not be served to primary readers from the shared cache
+        self.assertIsNone(cache.get(snapshot_cache_key(self.project.id)))
+
+        with mock.patch.object(views, 'run_module2', lambda *args: False):
+            self.client.post(f'/project/{self.project.id}/execute/')
+
+        self.assertContains(self.client.get('/dashboard/'), 'Zeta')
+        payload = self.client.get(f'/api/project/{self.project.id}/report/').json()
+        self.assertEqual(payload['insights']['why_competitors_win'], 'Primary only')
@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('search/', views.search, name='search'),
     
     # Project workflow
     path('project/create/', views.create_project, name='create_project'),
@@ -29,5 +30,10 @@ urlpatterns = [
          name='competitor_impersonation'),
     
     # API
+    path('api/search/', views.api_search, name='api_search'),
     path('api/project/<int:project_id>/status/', views.api_project_status, name='api_project_status'),
+    path('api/project/<int:project_id>/report/', views.api_report_snapshot, name='api_report_snapshot'),
+    path('api/project/<int:project_id>/report/<slug:section>/', views.api_report_section, name='api_report_section'),
+    path('api/project/<int:project_id>/trends/', views.api_project_trends, name='api_project_trends'),
+    path('api/project/<int:project_id>/export/<slug:dataset>.<slug:fmt>', views.export_project_data, name='export_project_data'),
 ]
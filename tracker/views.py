@@ -6,17 +6,28 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods, condition
+from django.conf import settings
+from django.db import connection
 import threading
 
 from .models import (
     VisibilityProject, Brand, Competitor, Prompt, AIModel, 
-    ModelSelection, VisibilityScore, DetailedReport
+    ModelSelection, VisibilityScore, DetailedReport, PromptResponse
 )
 from .workflows import run_module1
 from .module2_engine import run_module2
 from .module3_engine import run_module3
+from .prompt_dedup import find_near_duplicates, estimate_saved_calls
+from .report_snapshot import get_snapshot, report_version, snapshot_etag, version_last_modified
+from .runs import start_run, brand_trends, ROLLUP_PERIODS
+from .db_routing import read_replica, stick_to_primary
+from .exporters import EXPORT_DATASETS, EXPORT_FORMATS, ExportUnavailable, stream_export
+from .report_api import (
+    REPORT_SECTIONS, HEAVY_REPORT_FIELDS, InvalidCursor, StaleCursor, parse_limit, section_page
+)
+from .search import InvalidQuery, SearchUnavailable, search_responses
 
 
 def index(request):
@@ -57,6 +68,7 @@ def login_view(request):
 
 
 @login_required
+@read_replica
 def dashboard(request):
     """Main dashboard showing all projects"""
     projects = VisibilityProject.objects.filter(user=request.user).order_by('-created_at')
@@ -70,6 +82,7 @@ def create_project(request):
         company_name = request.POST.get('company_name')
         company_description = request.POST.get('company_description')
         area_of_work = request.POST.get('area_of_work')
+        force_refresh = 'force_refresh' in request.POST
         
         if not all([company_name, company_description, area_of_work]):
             messages.error(request, 'All fields are required')
@@ -94,11 +107,16 @@ def create_project(request):
         
         # Run Module 1 in background
         def run_analysis():
-            run_module1(project.id)
+            try:
+                run_module1(project.id, force_refresh=force_refresh)
+            finally:
+                # Hand the thread's connection back (pooled or persistent connections would leak)
+                connection.close()
         
         thread = threading.Thread(target=run_analysis)
         thread.daemon = True
         thread.start()
+        stick_to_primary(request)
         
         messages.success(request, 'Project created! Analyzing your company...')
         return redirect('validate_project', project_id=project.id)
@@ -163,18 +181,44 @@ def validate_project(request, project_id):
                         is_selected=True
                     )
         
+        # Keep only the first prompt of each near-duplicate group
+        if 'merge_duplicates' in request.POST:
+            selected = project.prompts.filter(is_selected=True).values_list('id', 'text')
+            duplicate_ids = [
+                prompt_id
+                for group in find_near_duplicates(selected)
+                for prompt_id in group[1:]
+            ]
+            if duplicate_ids:
+                project.prompts.filter(id__in=duplicate_ids).update(is_selected=False)
+                messages.info(request, f'Merged {len(duplicate_ids)} near-duplicate prompts')
+        
         project.status = 'validating'
         project.save()
         
         return redirect('select_models', project_id=project.id)
     
     competitors = project.competitors.all()
-    prompts = project.prompts.all()
+    prompts = list(project.prompts.all())
+    
+    # Flag paraphrased prompts with the text of the prompt they duplicate
+    prompt_texts = {prompt.id: prompt.text for prompt in prompts}
+    duplicate_groups = find_near_duplicates(prompt_texts.items())
+    duplicate_of = {
+        prompt_id: prompt_texts[group[0]]
+        for group in duplicate_groups
+        for prompt_id in group[1:]
+    }
+    for prompt in prompts:
+        prompt.duplicate_of = duplicate_of.get(prompt.id)
+    model_count = AIModel.objects.filter(is_active=True).count() or 1
     
     return render(request, 'tracker/validate_project.html', {
         'project': project,
         'competitors': competitors,
-        'prompts': prompts
+        'prompts': prompts,
+        'duplicate_count': len(duplicate_of),
+        'saved_calls': estimate_saved_calls(duplicate_groups, model_count)
     })
 
 
@@ -227,14 +271,21 @@ def execute_check(request, project_id):
     project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
     
     if request.method == 'POST':
-        # Start execution in background
+        # Start execution in background; each execution is versioned as a run
+        run = start_run(project)
+        # Progress and the new report are read back from the primary until the replica catches up
+        stick_to_primary(request)
+        
         def run_full_check():
-            # Run Module 2
-            success = run_module2(project.id)
-            
-            if success:
-                # Run Module 3
-                run_module3(project.id)
+            try:
+                # Run Module 2
+                success = run_module2(project.id, run.id)
+                
+                if success:
+                    # Run Module 3
+                    run_module3(project.id, run.id)
+            finally:
+                connection.close()
         
         thread = threading.Thread(target=run_full_check)
         thread.daemon = True
@@ -257,16 +308,19 @@ def execute_check(request, project_id):
 
 
 @login_required
+@read_replica
 def check_status(request, project_id):
     """Check execution status"""
     project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
     
     return render(request, 'tracker/check_status.html', {
-        'project': project
+        'project': project,
+        'partial_report_available': _partial_report_available(project)
     })
 
 
 @login_required
+@read_replica
 @require_http_methods(["GET"])
 def api_project_status(request, project_id):
     """API endpoint to check project status"""
@@ -279,28 +333,211 @@ def api_project_status(request, project_id):
     })
 
 
+def _completed_report_version(request, project_id):
+    """Version of the user's completed report and its scores (see report_version), or None"""
+    return report_version(DetailedReport.objects.filter(
+        project_id=project_id,
+        project__user_id=request.user.id,
+        project__status='completed'
+    ))
+
+
+def _report_etag(request, project_id):
+    version = _completed_report_version(request, project_id)
+    return snapshot_etag(*version) if version else None
+
+
+def _report_last_modified(request, project_id):
+    version = _completed_report_version(request, project_id)
+    return version_last_modified(version) if version else None
+
+
 @login_required
+@read_replica
+@condition(etag_func=_report_etag, last_modified_func=_report_last_modified)
 def view_report(request, project_id):
     """View final report"""
     project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
     
-    if project.status != 'completed':
+    is_partial = project.status != 'completed'
+    
+    # With section streaming, sections already written can be shown while module 3 runs
+    if is_partial and not _partial_report_available(project):
         messages.warning(request, 'Report not ready yet')
         return redirect('check_status', project_id=project.id)
     
-    # Get report
-    report = get_object_or_404(DetailedReport, project=project)
+    if not is_partial:
+        # Completed reports are served from the pre-rendered snapshot
+        snapshot = get_snapshot(project)
+        if snapshot is None:
+            raise Http404('Report not found')
+        
+        return render(request, 'tracker/view_report.html', {
+            'project': project,
+            'snapshot_html': snapshot['html']
+        })
+    
+    # Heavy sections are fetched by the page through api_report_section
+    report = get_object_or_404(DetailedReport.objects.defer(*HEAVY_REPORT_FIELDS), project=project)
     
     # Get visibility scores
-    scores = VisibilityScore.objects.filter(project=project).order_by('-normalized_score')
+    scores = VisibilityScore.objects.filter(project=project).select_related('brand').order_by('-normalized_score')
     
     return render(request, 'tracker/view_report.html', {
         'project': project,
         'report': report,
-        'scores': scores
+        'scores': scores,
+        'is_partial': is_partial
     })
 
 
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+@condition(etag_func=_report_etag, last_modified_func=_report_last_modified)
+def api_report_snapshot(request, project_id):
+    """Compact JSON summary of a completed report"""
+    project = get_object_or_404(VisibilityProject, id=project_id, user=request.user, status='completed')
+    
+    snapshot = get_snapshot(project)
+    if snapshot is None:
+        raise Http404('Report not found')
+    
+    return JsonResponse(snapshot['payload'])
+
+
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+def api_report_section(request, project_id, section):
+    """Cursor-paginated JSON for a single report section"""
+    project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
+    
+    if section not in REPORT_SECTIONS:
+        raise Http404('Unknown report section')
+    
+    try:
+        page = section_page(
+            project.id, section,
+            cursor=request.GET.get('cursor'),
+            limit=parse_limit(request.GET.get('limit'))
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except StaleCursor:
+        return JsonResponse({'error': 'Report changed, restart pagination without a cursor'}, status=409)
+    
+    if page is None:
+        raise Http404('Report not found')
+    
+    return JsonResponse(page)
+
+
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+def export_project_data(request, project_id, dataset, fmt):
+    """Stream raw project facts as CSV, NDJSON, Parquet or Arrow"""
+    project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
+    
+    if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export')
+    
+    if project.archived_at:
+        return JsonResponse({'error': 'Raw data of this project is archived; start a new check to restore it'}, status=409)
+    
+    try:
+        chunks = stream_export(project.id, dataset, fmt)
+    except ExportUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=501)
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="project-{project.id}-{dataset}.{extension}"'
+    return response
+
+
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+def api_project_trends(request, project_id):
+    """Per-brand score trend from the daily or weekly rollups"""
+    project = get_object_or_404(VisibilityProject, id=project_id, user=request.user)
+    
+    period = request.GET.get('period', 'week')
+    if period not in ROLLUP_PERIODS:
+        return JsonResponse({'error': f'period must be one of {", ".join(ROLLUP_PERIODS)}'}, status=400)
+    
+    runs = list(project.runs.order_by('-number').values('number', 'status', 'started_at', 'finished_at', 'stats')[:20])
+    
+    return JsonResponse({
+        'period': period,
+        'series': brand_trends(project.id, period, request.GET.get('brand')),
+        'recent_runs': runs
+    })
+
+
+def _search_page(request):
+    """Search the user's responses with q, limit, offset and the project, model and prompt ids"""
+    responses = PromptResponse.objects.filter(project__user=request.user, status='success')
+    try:
+        for param, field in (('project', 'project_id'), ('model', 'model_id'), ('prompt', 'prompt_id')):
+            if request.GET.get(param):
+                responses = responses.filter(**{field: int(request.GET[param])})
+        offset = max(0, int(request.GET.get('offset') or 0))
+    except ValueError:
+        raise InvalidQuery('project, model, prompt and offset must be integers')
+    try:
+        limit = parse_limit(request.GET.get('limit'))
+    except InvalidCursor as e:
+        raise InvalidQuery(str(e))
+    
+    return search_responses(responses, request.GET.get('q', ''), limit=limit, offset=offset)
+
+
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+def search(request):
+    """Full-text search across the user's collected responses"""
+    context = {
+        'projects': VisibilityProject.objects.filter(user=request.user).only('id', 'company_name'),
+        'models': AIModel.objects.all(),
+        'filters': request.GET,
+    }
+    
+    if request.GET.get('q'):
+        try:
+            context['page'] = _search_page(request)
+        except (InvalidQuery, SearchUnavailable) as e:
+            context['error'] = str(e)
+    
+    return render(request, 'tracker/search.html', context)
+
+
+@login_required
+@read_replica
+@require_http_methods(["GET"])
+def api_search(request):
+    """Matching responses with highlighted snippets, as JSON"""
+    try:
+        page = _search_page(request)
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except SearchUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=501)
+    
+    return JsonResponse(page)
+
+
+def _partial_report_available(project):
+    return (
+        settings.MODULE3_STREAM_SECTIONS
+        and project.status == 'analyzing'
+        and DetailedReport.objects.filter(project=project).exists()
+    )
+
+
 @login_required
 def competitor_impersonation(request, project_id, competitor_id):
     """Run analysis from competitor's perspective"""
@@ -316,7 +553,8 @@ def competitor_impersonation(request, project_id, competitor_id):
         area_of_work=original_project.area_of_work,
         status='setup',
         is_competitor_view=True,
-        competitor_brand_id=competitor.id
+        competitor_brand_id=competitor.id,
+        source_project=original_project
     )
     
     # Copy data from original project
@@ -345,5 +583,22 @@ def competitor_impersonation(request, project_id, competitor_id):
         is_validated=True
     )
     
+    # Same prompts and models, so module 2 can reuse the original responses
+    for prompt in original_project.prompts.all():
+        Prompt.objects.create(
+            project=new_project,
+            text=prompt.text,
+            is_ai_generated=prompt.is_ai_generated,
+            is_selected=prompt.is_selected
+        )
+    
+    for selection in original_project.selected_models.filter(is_selected=True):
+        ModelSelection.objects.create(
+            project=new_project,
+            model=selection.model,
+            is_selected=True
+        )
+    
+    stick_to_primary(request)
     messages.success(request, f'Created impersonation view for {competitor.name}')
     return redirect('validate_project', project_id=new_project.id)
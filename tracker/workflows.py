@@ -5,14 +5,20 @@ from typing import TypedDict, Annotated, List, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, SystemMessage
 import json
+import hashlib
 import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 
 from .ai_config import get_chatgpt, invoke_chatgpt, AIModelConfig
 from .models import (
     VisibilityProject, Brand, Competitor, Prompt, AIModel, 
     ModelSelection, PromptResponse, BrandMention, SentimentScore,
-    VisibilityScore, DetailedReport, ExecutionLog
+    VisibilityScore, DetailedReport, ExecutionLog, WorkflowCache
 )
+from .response_store import normalize_prompt
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +38,75 @@ class Module1State(TypedDict):
     prompts: List[str]
     status: str
     error: str
+    force_refresh: bool
+
+
+# ============================================================
+# Industry cache for competitor discovery and prompt generation
+# ============================================================
+
+def _cache_key(state: Module1State) -> str:
+    """Hash of the normalized industry and company name"""
+    industry = normalize_prompt(state['area_of_work'])
+    company = normalize_prompt(state['company_name'])
+    return hashlib.sha256(f"{industry}|{company}".encode('utf-8')).hexdigest()
+
+
+def load_cached_result(kind: str, state: Module1State):
+    """Cached payload for this industry and company, or None if missing, stale or bypassed"""
+    if state.get('force_refresh'):
+        return None
+    
+    cutoff = timezone.now() - timedelta(hours=settings.MODULE1_CACHE_TTL_HOURS)
+    entry = WorkflowCache.objects.filter(
+        kind=kind,
+        cache_key=_cache_key(state),
+        updated_at__gte=cutoff
+    ).first()
+    
+    if entry is None or not entry.payload:
+        return None
+    
+    WorkflowCache.objects.filter(id=entry.id).update(hit_count=F('hit_count') + 1)
+    return entry.payload
+
+
+def store_cached_result(kind: str, state: Module1State, payload: List) -> None:
+    """Save a fresh LLM result for later projects in the same industry"""
+    WorkflowCache.objects.update_or_create(
+        kind=kind,
+        cache_key=_cache_key(state),
+        defaults={
+            'area_of_work': state['area_of_work'],
+            'company_name': state['company_name'],
+            'payload': payload
+        }
+    )
+
+
+def _save_competitors(project: VisibilityProject, competitors: List[Dict[str, str]]) -> None:
+    for comp in competitors:
+        Competitor.objects.get_or_create(
+            project=project,
+            name=comp['name'],
+            defaults={
+                'description': comp.get('description', ''),
+                'is_ai_suggested': True,
+                'is_validated': False
+            }
+        )
+
+
+def _save_prompts(project: VisibilityProject, prompts: List[str]) -> None:
+    for prompt_text in prompts:
+        Prompt.objects.get_or_create(
+            project=project,
+            text=prompt_text,
+            defaults={
+                'is_ai_generated': True,
+                'is_selected': False
+            }
+        )
 
 
 def analyze_company(state: Module1State) -> Module1State:
@@ -125,6 +200,20 @@ def discover_competitors(state: Module1State) -> Module1State:
             message='Starting competitor discovery'
         )
         
+        cached = load_cached_result('competitors', state)
+        if cached is not None:
+            _save_competitors(project, cached)
+            state['competitors'] = cached
+            state['status'] = 'generating_prompts'
+            
+            ExecutionLog.objects.create(
+                project=project,
+                module='module1',
+                level='info',
+                message=f'Loaded {len(cached)} competitors from industry cache'
+            )
+            return state
+        
         prompt = f"""You are a market research expert. Based on this company:
 
 Company: {state['company_name']}
@@ -160,16 +249,8 @@ Be specific and relevant. Only include direct competitors."""
             competitors = json.loads(response)
             
             # Save to database
-            for comp in competitors:
-                Competitor.objects.get_or_create(
-                    project=project,
-                    name=comp['name'],
-                    defaults={
-                        'description': comp.get('description', ''),
-                        'is_ai_suggested': True,
-                        'is_validated': False
-                    }
-                )
+            _save_competitors(project, competitors)
+            store_cached_result('competitors', state, competitors)
             
             state['competitors'] = competitors
             
@@ -207,6 +288,22 @@ def generate_prompts(state: Module1State) -> Module1State:
             message='Starting prompt generation'
         )
         
+        cached = load_cached_result('prompts', state)
+        if cached is not None:
+            _save_prompts(project, cached)
+            state['prompts'] = cached
+            state['status'] = 'completed'
+            project.status = 'validating'
+            project.save()
+            
+            ExecutionLog.objects.create(
+                project=project,
+                module='module1',
+                level='info',
+                message=f'Loaded {len(cached)} prompts from industry cache'
+            )
+            return state
+        
         competitor_names = [c['name'] for c in state.get('competitors', [])]
         
         prompt = f"""You are a user behavior expert. Generate 8-12 realistic questions that users might ask AI assistants about products/services in this category:
@@ -250,15 +347,8 @@ Examples for a CRM tool:
             prompts = json.loads(response)
             
             # Save to database
-            for prompt_text in prompts:
-                Prompt.objects.get_or_create(
-                    project=project,
-                    text=prompt_text,
-                    defaults={
-                        'is_ai_generated': True,
-                        'is_selected': False
-                    }
-                )
+            _save_prompts(project, prompts)
+            store_cached_result('prompts', state, prompts)
             
             state['prompts'] = prompts
             
@@ -304,7 +394,7 @@ def create_module1_graph():
     return workflow.compile()
 
 
-def run_module1(project_id: int) -> Dict[str, Any]:
+def run_module1(project_id: int, force_refresh: bool = False) -> Dict[str, Any]:
     """Execute Module 1 workflow"""
     project = VisibilityProject.objects.get(id=project_id)
     
@@ -317,7 +407,8 @@ def run_module1(project_id: int) -> Dict[str, Any]:
         'competitors': [],
         'prompts': [],
         'status': 'started',
-        'error': ''
+        'error': '',
+        'force_refresh': force_refresh
     }
     
     graph = create_module1_graph()